@@ -1,5 +1,17 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.contrib import admin
-from .models import UserProfile, ApiLog
+from django.contrib.auth.models import User
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from django_internship import cache
+
+from .models import UserProfile, ApiLog, ApiLogClientRollup, ApiLogRollup, EmailDelivery
+from .pagination import EstimatedCountPaginator
+from .rollups import use_rollups
+from .sketches import DDSketch
 
 
 @admin.register(UserProfile)
@@ -10,6 +22,147 @@ class UserProfileAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at', 'updated_at']
 
 
+class ApiLogWindowFilter(admin.SimpleListFilter):
+    """
+    Time window for the API log changelist. Defaults to
+    API_LOG_ADMIN_DEFAULT_WINDOW so the first page only scans recent rows.
+    """
+    title = 'time window'
+    parameter_name = 'window'
+    windows = {
+        '1h': ('Last hour', timedelta(hours=1)),
+        '24h': ('Last 24 hours', timedelta(days=1)),
+        '7d': ('Last 7 days', timedelta(days=7)),
+        '30d': ('Last 30 days', timedelta(days=30)),
+        'all': ('All time', None),
+    }
+
+    def lookups(self, request, model_admin):
+        return [(key, label) for key, (label, _) in self.windows.items()]
+
+    def value(self):
+        value = super().value()
+        if value not in self.windows:
+            value = getattr(settings, 'API_LOG_ADMIN_DEFAULT_WINDOW', '24h')
+        return value
+
+    def choices(self, changelist):
+        # No "All" entry: the default window is always applied
+        for lookup, title in self.lookup_choices:
+            yield {
+                'selected': self.value() == lookup,
+                'query_string': changelist.get_query_string({self.parameter_name: lookup}),
+                'display': title,
+            }
+
+    def queryset(self, request, queryset):
+        window = self.windows.get(self.value(), (None, None))[1]
+        if window is None:
+            return queryset
+        return queryset.filter(timestamp__gte=timezone.now() - window)
+
+
+class CachedChoicesFilter(admin.SimpleListFilter):
+    """
+    SimpleListFilter whose choices are computed by ``load_choices`` at most
+    once per API_LOG_ADMIN_FILTER_CACHE_TIMEOUT seconds.
+    """
+    field_name = None
+
+    def lookups(self, request, model_admin):
+        return cache.get_or_set(
+            'api_admin',
+            f'apilog:{self.parameter_name}:choices',
+            self.load_choices,
+            getattr(settings, 'API_LOG_ADMIN_FILTER_CACHE_TIMEOUT', 300),
+        )
+
+    def load_choices(self):
+        raise NotImplementedError
+
+    def recent_logs(self):
+        since = timezone.now() - ApiLogWindowFilter.windows['30d'][1]
+        return ApiLog.objects.filter(timestamp__gte=since)
+
+    def recent_source(self):
+        """Hourly rollups when they are kept, else recent raw logs."""
+        if not use_rollups():
+            return self.recent_logs()
+        since = timezone.now() - ApiLogWindowFilter.windows['30d'][1]
+        return ApiLogRollup.objects.filter(granularity=ApiLogRollup.HOUR, bucket_start__gte=since)
+
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+        return queryset.filter(**{self.field_name: self.value()})
+
+
+class ApiLogMethodFilter(CachedChoicesFilter):
+    title = 'method'
+    parameter_name = 'method'
+    field_name = 'method'
+
+    def lookups(self, request, model_admin):
+        return [(method, method) for method in ('GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'HEAD', 'OPTIONS')]
+
+
+class ApiLogStatusFilter(CachedChoicesFilter):
+    title = 'response status'
+    parameter_name = 'response_status'
+    field_name = 'response_status'
+
+    def load_choices(self):
+        statuses = self.recent_source().order_by('response_status').values_list('response_status', flat=True).distinct()
+        return [(str(status), str(status)) for status in statuses]
+
+
+class ApiLogEndpointFilter(CachedChoicesFilter):
+    title = 'endpoint'
+    parameter_name = 'endpoint'
+    field_name = 'endpoint'
+
+    def load_choices(self):
+        endpoints = self.recent_source().order_by('endpoint').values_list('endpoint', flat=True).distinct()
+        return [(endpoint, endpoint) for endpoint in endpoints]
+
+
+class ApiLogUserFilter(CachedChoicesFilter):
+    """
+    The ``max_choices`` busiest users of the last 30 days, counted from the
+    hourly client rollups when they are kept. Any other user can still be
+    selected with ``?user=<id>`` and is then listed too.
+    """
+    title = 'user'
+    parameter_name = 'user'
+    field_name = 'user_id'
+    max_choices = 100
+
+    def lookups(self, request, model_admin):
+        choices = super().lookups(request, model_admin)
+        value = self.value()
+        if value and value.isdigit() and value not in {user_id for user_id, _ in choices}:
+            username = User.objects.filter(pk=value).values_list('username', flat=True).first()
+            if username is not None:
+                choices = [(value, username)] + choices
+        return choices
+
+    def load_choices(self):
+        if use_rollups():
+            since = timezone.now() - ApiLogWindowFilter.windows['30d'][1]
+            source = ApiLogClientRollup.objects.filter(granularity=ApiLogClientRollup.HOUR, bucket_start__gte=since)
+            requests = Sum('request_count')
+        else:
+            source = self.recent_logs()
+            requests = Count('id')
+        users = (
+            source.filter(user__isnull=False).order_by()
+            .values_list('user_id', 'user__username')
+            .annotate(requests=requests)
+            .order_by('-requests', 'user__username')
+        )
+        return [(str(user_id), username) for user_id, username, _ in users[:self.max_choices]]
+
+
 @admin.register(ApiLog)
 class ApiLogAdmin(admin.ModelAdmin):
     """
@@ -33,6 +186,22 @@ class ApiLogAdmin(admin.ModelAdmin):
     ordering = ['-timestamp']
     date_hierarchy = 'timestamp'
     list_per_page = 25
+    list_select_related = ['user']
+    
+    # Used instead of the settings above when API_LOG_ADMIN_PERFORMANCE_MODE
+    # is on, so the changelist never counts or DISTINCTs the whole table
+    performance_list_filter = [
+        ApiLogWindowFilter, ApiLogMethodFilter, ApiLogStatusFilter,
+        ApiLogEndpointFilter, ApiLogUserFilter,
+    ]
+    
+    def __init__(self, model, admin_site):
+        super().__init__(model, admin_site)
+        if getattr(settings, 'API_LOG_ADMIN_PERFORMANCE_MODE', False):
+            self.list_filter = self.performance_list_filter
+            self.date_hierarchy = None
+            self.show_full_result_count = False
+            self.paginator = EstimatedCountPaginator
     
     # Disable add/change permissions (logs should be read-only)
     def has_add_permission(self, request):
@@ -106,3 +275,67 @@ class ApiLogAdmin(admin.ModelAdmin):
             'fields': ('response_status', 'response_time')
         })
     )
+
+
+@admin.register(ApiLogRollup)
+class ApiLogRollupAdmin(admin.ModelAdmin):
+    """
+    Read-only view of the pre-aggregated API log rollups with latency percentiles.
+    """
+    list_display = [
+        'bucket_start', 'granularity', 'endpoint', 'response_status', 'request_count',
+        'error_count', 'avg_display', 'p50_display', 'p95_display', 'p99_display'
+    ]
+    list_filter = ['granularity', 'response_status']
+    search_fields = ['endpoint']
+    ordering = ['-bucket_start']
+    list_per_page = 50
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+    
+    def _ms(self, seconds):
+        return f"{seconds * 1000:.1f}ms" if seconds is not None else "-"
+    
+    def _quantile(self, obj, q):
+        return self._ms(DDSketch.from_dict(obj.latency_sketch).quantile(q))
+    
+    def avg_display(self, obj):
+        return self._ms(obj.avg_response_time)
+    avg_display.short_description = "Avg"
+    
+    def p50_display(self, obj):
+        return self._quantile(obj, 0.5)
+    p50_display.short_description = "p50"
+    
+    def p95_display(self, obj):
+        return self._quantile(obj, 0.95)
+    p95_display.short_description = "p95"
+    
+    def p99_display(self, obj):
+        return self._quantile(obj, 0.99)
+    p99_display.short_description = "p99"
+
+
+@admin.register(EmailDelivery)
+class EmailDeliveryAdmin(admin.ModelAdmin):
+    """
+    Read-only view of the email delivery ledger kept by the email tasks.
+    """
+    list_display = ['message_key', 'recipient', 'status', 'attempts', 'updated_at']
+    list_filter = ['status']
+    search_fields = ['message_key', 'recipient']
+    ordering = ['-updated_at']
+    list_per_page = 50
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,89 @@
+"""
+Authentication classes for the api app.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.functional import SimpleLazyObject
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from django_internship import cache
+
+from .tokens import is_expired
+
+TOKEN_CACHE_NAMESPACE = 'auth_token'
+# Non-secret user fields kept with a cached token, enough for the protected
+# endpoint and the permission checks to run without loading the user.
+CACHED_USER_FIELDS = ('username', 'email', 'first_name', 'last_name', 'is_active', 'is_staff', 'is_superuser')
+
+
+def token_cache_key(key):
+    """Cache key for a token; the raw token never appears in the cache."""
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def forget_token(key):
+    """Drop a token from the authentication cache."""
+    cache.delete(TOKEN_CACHE_NAMESPACE, token_cache_key(key))
+
+
+class CachedTokenUser(SimpleLazyObject):
+    """
+    User loaded from the database on first use. Its id and CACHED_USER_FIELDS
+    are answered from the cache entry without loading it.
+    """
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, user_id, fields):
+        super().__init__(lambda: get_user_model().objects.get(pk=user_id))
+        # Set through __dict__: LazyObject.__setattr__ would load the user
+        self.__dict__.update(fields, pk=user_id, id=user_id)
+
+    def __bool__(self):
+        # IsAuthenticated tests the user's truth value
+        return True
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Drop-in replacement for TokenAuthentication that caches the token's user
+    id and creation time and the user's CACHED_USER_FIELDS (never the
+    password) for API_TOKEN_CACHE_TIMEOUT seconds, so repeat calls skip the
+    Token/User join; the user itself is only loaded if the view reads any
+    other field. Entries are dropped when the token is deleted or its user is
+    saved (see api.signals), e.g. on deactivation or an email change. Tokens
+    older than API_TOKEN_TTL are rejected.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = token_cache_key(key)
+        entry = cache.get(TOKEN_CACHE_NAMESPACE, cache_key)
+        if entry is None:
+            model = self.get_model()
+            try:
+                token = model.objects.select_related('user').get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            user = token.user
+            if user.is_active:
+                cache.set(
+                    TOKEN_CACHE_NAMESPACE, cache_key,
+                    (user.pk, token.created, {field: getattr(user, field) for field in CACHED_USER_FIELDS}),
+                    getattr(settings, 'API_TOKEN_CACHE_TIMEOUT', 60),
+                )
+        else:
+            user_id, created, fields = entry
+            user = CachedTokenUser(user_id, fields)
+            token = self.get_model()(key=key, user_id=user_id, created=created)
+
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        if is_expired(token):
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+
+        return (user, token)
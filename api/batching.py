@@ -0,0 +1,97 @@
+"""
+In-process batching for work that should not run on the request path.
+
+Items are queued by the caller and handed to a flush callback in batches by a
+daemon thread, either when ``batch_size`` items are pending or when
+``flush_interval`` seconds have passed. Pending items are flushed when the
+process exits.
+"""
+import atexit
+import logging
+import os
+import threading
+from collections import deque
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundBatcher:
+    """Queue items in memory and flush them in batches from a background thread."""
+
+    def __init__(self, flush_callback, batch_size=100, flush_interval=2.0,
+                 max_queue_size=10000, name='batcher'):
+        self.flush_callback = flush_callback
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.name = name
+        self.dropped = 0
+
+        # Oldest items are discarded once the queue is full so a stalled
+        # backend can never exhaust the worker's memory.
+        self._queue = deque(maxlen=max_queue_size)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        atexit.register(self.close)
+
+    def __len__(self):
+        return len(self._queue)
+
+    def put(self, item):
+        """Queue an item; never blocks on the flush callback."""
+        self._ensure_thread()
+        with self._lock:
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1
+                if self.dropped % 1000 == 1:
+                    logger.warning(f"{self.name}: queue full, {self.dropped} items dropped so far")
+            self._queue.append(item)
+            pending = len(self._queue)
+        if pending >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """Hand every pending item to the flush callback, one batch at a time."""
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    count = min(self.batch_size, len(self._queue))
+                    batch = [self._queue.popleft() for _ in range(count)]
+                if not batch:
+                    return
+                try:
+                    self.flush_callback(batch)
+                except Exception as e:
+                    logger.error(f"{self.name}: failed to flush {len(batch)} items: {e}")
+
+    def close(self):
+        """Flush whatever is still pending (registered with atexit)."""
+        self._pid = None
+        self._wakeup.set()
+        self.flush()
+
+    def _ensure_thread(self):
+        # Threads do not survive fork(), so preforked workers (gunicorn
+        # --preload, celery prefork) each start their own flusher.
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+            # This thread owns its own database connection; drop it when it
+            # is past CONN_MAX_AGE or broken so the next flush reconnects.
+            close_old_connections()
@@ -0,0 +1,88 @@
+"""
+Helpers shared by the benchmark management commands.
+
+Benchmarks run against a throwaway test database so seeding millions of
+rows never touches the real data.
+"""
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.utils import timezone
+
+from .models import ApiLog
+
+# (endpoint, method, relative weight) roughly matching production traffic.
+ENDPOINTS = [
+    ('/api/public/', 'GET', 40),
+    ('/api/protected/', 'GET', 25),
+    ('/api/profile/', 'GET', 15),
+    ('/api/profile/', 'PUT', 3),
+    ('/api/login/', 'POST', 10),
+    ('/api/register/', 'POST', 2),
+    ('/api/logs/', 'GET', 5),
+]
+STATUSES = [(200, 85), (201, 3), (400, 4), (401, 5), (403, 1), (404, 1), (500, 1)]
+
+
+@contextmanager
+def benchmark_database(verbosity=0):
+    """Create a test database for the duration of the block."""
+    old_name = connection.creation.create_test_db(
+        verbosity=verbosity, autoclobber=True, serialize=False
+    )
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+
+
+def seed_api_logs(rows, days=30, users=1000, batch_size=10000, progress=None):
+    """Insert ``rows`` synthetic ApiLog rows spread over the last ``days`` days."""
+    User.objects.bulk_create(
+        [User(username=f'bench_user_{i}', email=f'bench_{i}@example.com') for i in range(users)],
+        batch_size=batch_size,
+    )
+    user_ids = list(User.objects.filter(username__startswith='bench_user_').values_list('id', flat=True))
+
+    endpoints, endpoint_weights = zip(*[((e, m), w) for e, m, w in ENDPOINTS])
+    statuses, status_weights = zip(*STATUSES)
+    now = timezone.now()
+    span = days * 86400
+    rng = random.Random(42)
+
+    created = 0
+    while created < rows:
+        count = min(batch_size, rows - created)
+        picks = rng.choices(endpoints, endpoint_weights, k=count)
+        codes = rng.choices(statuses, status_weights, k=count)
+        ApiLog.objects.bulk_create([
+            ApiLog(
+                endpoint=endpoint,
+                method=method,
+                user_id=rng.choice(user_ids) if rng.random() < 0.7 else None,
+                ip_address=f'10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}',
+                timestamp=now - timedelta(seconds=rng.random() * span),
+                response_status=code,
+                response_time=rng.lognormvariate(-3.5, 0.8),
+            )
+            for (endpoint, method), code in zip(picks, codes)
+        ])
+        created += count
+        if progress:
+            progress(created)
+    return created
+
+
+def time_call(func, repeat=5):
+    """Run ``func`` ``repeat`` times and return the median duration in ms."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    return statistics.median(durations)
@@ -0,0 +1,82 @@
+"""
+Response caching for views whose output does not depend on the user.
+"""
+import hashlib
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+
+from django_internship import cache
+
+NAMESPACE = 'response'
+
+
+def response_cache_key(name, request):
+    """Cache key for ``name`` that varies on the full path and Accept header."""
+    variant = f"{request.get_full_path()}|{request.META.get('HTTP_ACCEPT', '')}"
+    return f"{name}:{hashlib.md5(variant.encode()).hexdigest()}"
+
+
+def has_credentials(request):
+    """Whether the request carries a session cookie or an Authorization header."""
+    return settings.SESSION_COOKIE_NAME in request.COOKIES or 'HTTP_AUTHORIZATION' in request.META
+
+
+def is_json(response):
+    return response.get('Content-Type', '').startswith('application/json')
+
+
+def cache_response(name, timeout=None):
+    """
+    Serve GET/HEAD responses of a view from the cache for ``timeout`` seconds
+    (API_RESPONSE_CACHE_TIMEOUT by default).
+
+    Apply it outside ``@api_view`` so cache hits skip DRF negotiation,
+    permission checks and rendering. Responses carry an ETag and a
+    Cache-Control max-age for the rest of the entry's lifetime, and a
+    request whose If-None-Match matches gets a 304. ``invalidate('response')``
+    from django_internship.cache drops every cached response.
+
+    Only JSON is cached: the browsable API's HTML embeds the viewer's
+    username and CSRF token. Requests with a session or an Authorization
+    header bypass the cache altogether.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or has_credentials(request):
+                return view_func(request, *args, **kwargs)
+
+            key = response_cache_key(name, request)
+            entry = cache.get(NAMESPACE, key)
+            if entry is None:
+                response = view_func(request, *args, **kwargs)
+                if response.status_code != 200 or response.streaming:
+                    return response
+                if callable(getattr(response, 'render', None)):
+                    # DRF Response: render now so the bytes can be cached
+                    response.render()
+                if not is_json(response):
+                    return response
+                ttl = getattr(settings, 'API_RESPONSE_CACHE_TIMEOUT', 5) if timeout is None else timeout
+                entry = {
+                    'content': response.content,
+                    'content_type': response['Content-Type'],
+                    'etag': quote_etag(hashlib.md5(response.content).hexdigest()),
+                    'expires': time.time() + ttl,
+                }
+                cache.set(NAMESPACE, key, entry, ttl)
+            else:
+                response = HttpResponse(entry['content'], content_type=entry['content_type'])
+
+            response['ETag'] = entry['etag']
+            patch_cache_control(response, public=True, max_age=max(0, math.ceil(entry['expires'] - time.time())))
+            patch_vary_headers(response, ['Accept', 'Authorization', 'Cookie'])
+            return get_conditional_response(request, etag=entry['etag'], response=response)
+        return wrapped
+    return decorator
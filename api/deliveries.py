@@ -0,0 +1,90 @@
+"""
+Idempotent email sending backed by the EmailDelivery ledger.
+
+Every email task has an idempotency key that names the message it sends.
+By default it names the task invocation (``invocation_key``), which stays
+the same across the task's retries, so sending the same text again later
+is a new message. Callers that want identical content delivered only once
+pass a ``derive_message_key`` key explicitly. ``send_each_once`` takes a
+key per message, for messages such as welcome emails that are keyed by user.
+``send_once(message_key, messages)`` loads the ledger rows for all of the
+recipients in one query, skips recipients already marked as sent, sends the
+rest with ``send_batched`` and records the outcome of every attempt with
+one upsert. A retried or duplicate task therefore only costs that one
+query for recipients who already have the email.
+
+Messages are expected to have exactly one recipient in ``to``. Two copies
+of a task running at the same moment can both send; the ledger guards
+against retries and repeated enqueues, not concurrent duplicates.
+"""
+import hashlib
+import logging
+import uuid
+
+from .mail import send_batched
+from .models import EmailDelivery
+
+logger = logging.getLogger(__name__)
+
+
+def invocation_key(prefix, task_id):
+    """Idempotency key ``<prefix>:<task id>``; a fresh one when run outside a worker."""
+    return f"{prefix}:{task_id or uuid.uuid4().hex}"
+
+
+def derive_message_key(prefix, *parts):
+    """Idempotency key ``<prefix>:<digest of parts>`` for content-derived keys."""
+    digest = hashlib.sha256('\x00'.join(str(part) for part in parts).encode()).hexdigest()
+    return f"{prefix}:{digest[:32]}"
+
+
+def send_once(message_key, messages):
+    """
+    Send each message unless the ledger already has it as sent under
+    ``message_key``. Returns ``send_batched``'s result plus a ``skipped``
+    list of the messages that were already delivered.
+    """
+    return send_each_once([(message_key, message) for message in messages])
+
+
+def send_each_once(keyed_messages):
+    """``send_once`` for ``(message_key, message)`` pairs with their own keys."""
+    keys = {message_key for message_key, _ in keyed_messages}
+    ledger = {
+        (message_key, recipient): (status, attempts)
+        for message_key, recipient, status, attempts in EmailDelivery.objects.filter(
+            message_key__in=keys, recipient__in=[message.to[0] for _, message in keyed_messages]
+        ).values_list('message_key', 'recipient', 'status', 'attempts')
+    }
+    skipped, pending, keyed, seen = [], [], {}, set()
+    for message_key, message in keyed_messages:
+        entry = (message_key, message.to[0])
+        # A recipient listed twice under one key (users sharing an address) gets one email
+        if entry in seen or ledger.get(entry, (None, 0))[0] == EmailDelivery.SENT:
+            skipped.append(message)
+        else:
+            pending.append(message)
+            keyed[id(message)] = entry
+        seen.add(entry)
+    if skipped:
+        logger.info(f"Skipping {len(skipped)} emails already delivered for {', '.join(sorted(keys))}")
+
+    delivery = send_batched(pending)
+    outcomes = [(keyed[id(message)], EmailDelivery.SENT) for message in delivery['sent']]
+    outcomes += [(keyed[id(message)], EmailDelivery.FAILED) for message in delivery['failed']]
+    EmailDelivery.objects.bulk_create(
+        [
+            EmailDelivery(
+                message_key=message_key,
+                recipient=recipient,
+                status=status,
+                attempts=ledger.get((message_key, recipient), (None, 0))[1] + 1,
+            )
+            for (message_key, recipient), status in outcomes
+        ],
+        update_conflicts=True,
+        unique_fields=['message_key', 'recipient'],
+        update_fields=['status', 'attempts', 'updated_at'],
+    )
+    delivery['skipped'] = skipped
+    return delivery
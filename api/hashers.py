@@ -0,0 +1,119 @@
+"""
+Password hashers whose cost is read from settings.
+
+Django's hashers hard-code their cost parameters. These subclasses keep the
+same algorithm names, so existing hashes still verify, but take their cost
+from settings. Because Django's ``must_update`` compares a stored hash with
+the hasher's current parameters, changing a cost setting makes every user's
+hash upgrade transparently on their next successful login.
+
+``hash_passwords`` hashes large batches in a process pool that is shared
+by the requests of one process and shut down once it has been idle for
+API_BULK_REGISTRATION_POOL_IDLE_TIMEOUT seconds, so web workers do not keep
+idle hashing processes around. Its workers are spawned rather than forked,
+so they never inherit the locks of background threads such as the API log
+and task batchers.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher, make_password
+
+
+class TunableArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2id with ARGON2_TIME_COST, ARGON2_MEMORY_COST (KiB) and ARGON2_PARALLELISM."""
+
+    @property
+    def time_cost(self):
+        return getattr(settings, 'ARGON2_TIME_COST', Argon2PasswordHasher.time_cost)
+
+    @property
+    def memory_cost(self):
+        return getattr(settings, 'ARGON2_MEMORY_COST', Argon2PasswordHasher.memory_cost)
+
+    @property
+    def parallelism(self):
+        return getattr(settings, 'ARGON2_PARALLELISM', Argon2PasswordHasher.parallelism)
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 with PBKDF2_ITERATIONS iterations."""
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PBKDF2_ITERATIONS', PBKDF2PasswordHasher.iterations)
+
+
+# Default pool size when API_BULK_REGISTRATION_HASH_WORKERS is 0
+MAX_DEFAULT_WORKERS = 4
+
+_pool = None
+_pool_workers = 0
+_pool_users = 0
+_idle_timer = None
+_pool_lock = threading.Lock()
+
+
+def _acquire_pool(workers):
+    """The process-wide hashing pool, started on first use."""
+    global _pool, _pool_workers, _pool_users, _idle_timer
+    with _pool_lock:
+        if _idle_timer is not None:
+            _idle_timer.cancel()
+            _idle_timer = None
+        if _pool is not None and _pool_workers != workers and not _pool_users:
+            _pool.shutdown(wait=False)
+            _pool = None
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _pool_workers = workers
+        _pool_users += 1
+        return _pool
+
+
+def _release_pool():
+    """Schedule the pool's shutdown once nothing is using it."""
+    global _pool_users, _idle_timer
+    with _pool_lock:
+        _pool_users -= 1
+        if not _pool_users:
+            _idle_timer = threading.Timer(
+                getattr(settings, 'API_BULK_REGISTRATION_POOL_IDLE_TIMEOUT', 60), _shutdown_idle_pool
+            )
+            _idle_timer.daemon = True
+            _idle_timer.start()
+
+
+def _shutdown_idle_pool():
+    global _pool, _idle_timer
+    with _pool_lock:
+        if _pool is not None and not _pool_users:
+            _pool.shutdown(wait=False)
+            _pool = None
+        _idle_timer = None
+
+
+def hash_passwords(passwords, workers=None):
+    """
+    ``make_password`` for each password, in order, spread over a process pool.
+
+    Hashing is CPU bound, so large batches use up to ``workers`` processes
+    (API_BULK_REGISTRATION_HASH_WORKERS, default one per core up to
+    MAX_DEFAULT_WORKERS); batches too small to repay the round trip to the
+    pool are hashed inline.
+    """
+    workers = (
+        workers
+        or getattr(settings, 'API_BULK_REGISTRATION_HASH_WORKERS', 0)
+        or min(os.cpu_count() or 1, MAX_DEFAULT_WORKERS)
+    )
+    if workers < 2 or len(passwords) < getattr(settings, 'API_BULK_REGISTRATION_POOL_THRESHOLD', 16):
+        return [make_password(password) for password in passwords]
+    pool = _acquire_pool(workers)
+    try:
+        return list(pool.map(make_password, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+    finally:
+        _release_pool()
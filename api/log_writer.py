@@ -0,0 +1,106 @@
+"""
+Pluggable sinks for ApiLog records.
+
+The sink used by the API is chosen with the ``API_LOG_SINK`` setting:
+
+- ``api.log_writer.BufferedApiLogSink`` (default) queues records in-process
+  and writes them with ``bulk_create`` from a background thread.
+- ``api.log_writer.DirectApiLogSink`` writes each record immediately.
+"""
+import logging
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .batching import BackgroundBatcher
+from .models import ApiLog
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOG_SINK = 'api.log_writer.BufferedApiLogSink'
+
+_sink = None
+
+
+def get_client_ip(request):
+    """Get client IP address."""
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        ip = x_forwarded_for.split(',')[0]
+    else:
+        ip = request.META.get('REMOTE_ADDR')
+    return ip
+
+
+def build_log_record(request, response, response_time):
+    """Build the field values of an ApiLog row for a finished request."""
+    user = getattr(request, 'user', None)
+    return {
+        'endpoint': request.path,
+        'method': request.method,
+        'user_id': user.pk if user is not None and user.is_authenticated else None,
+        'ip_address': get_client_ip(request),
+        'timestamp': timezone.now(),
+        'response_status': response.status_code,
+        'response_time': response_time,
+    }
+
+
+class ApiLogSink:
+    """Base class for ApiLog sinks."""
+
+    def write(self, record):
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+
+class DirectApiLogSink(ApiLogSink):
+    """Write every record with its own INSERT."""
+
+    def write(self, record):
+        ApiLog.objects.create(**record)
+
+
+class BufferedApiLogSink(ApiLogSink):
+    """Queue records and write them with bulk_create outside the request."""
+
+    def __init__(self):
+        self.batcher = BackgroundBatcher(
+            self.write_batch,
+            batch_size=getattr(settings, 'API_LOG_BATCH_SIZE', 100),
+            flush_interval=getattr(settings, 'API_LOG_FLUSH_INTERVAL', 2.0),
+            max_queue_size=getattr(settings, 'API_LOG_MAX_QUEUE_SIZE', 10000),
+            name='api-log-writer',
+        )
+
+    def write(self, record):
+        self.batcher.put(record)
+
+    def flush(self):
+        self.batcher.flush()
+
+    def write_batch(self, records):
+        ApiLog.objects.bulk_create([ApiLog(**record) for record in records])
+        logger.debug(f"Flushed {len(records)} API logs")
+
+
+def get_log_sink():
+    """Return the process-wide sink configured by ``API_LOG_SINK``."""
+    global _sink
+    if _sink is None:
+        _sink = import_string(getattr(settings, 'API_LOG_SINK', DEFAULT_LOG_SINK))()
+    return _sink
+
+
+@receiver(setting_changed)
+def reset_log_sink(setting, **kwargs):
+    """Rebuild the sink when tests override its settings."""
+    global _sink
+    if setting.startswith('API_LOG_') and _sink is not None:
+        _sink.flush()
+        _sink = None
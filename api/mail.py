@@ -0,0 +1,98 @@
+"""
+Sending many emails over one mail server connection.
+
+``send_mail`` opens, authenticates and (for SMTP with TLS) negotiates a new
+connection for every message. ``send_batched`` opens one connection for the
+whole run and passes messages to ``send_messages`` in batches of
+EMAIL_BATCH_SIZE. When a send fails, the connection is reopened and the
+rest of the batch is sent again; a message that also fails on the fresh
+connection is given up on. Every message ends up in exactly one of the
+``sent`` and ``failed`` lists, so callers can retry only the failures.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.core.mail import get_connection
+
+logger = logging.getLogger(__name__)
+
+
+def _track(messages, delivered):
+    """Yield ``messages``, recording each one once the backend has sent it."""
+    for message in messages:
+        yield message
+        # Backends only ask for the next message after sending this one
+        delivered.append(message)
+
+
+def _send_batch(connection, pending, sent, failed):
+    """
+    Send ``pending`` over ``connection``, moving each message to ``sent`` or
+    ``failed`` as it is dealt with. Raises when the server cannot be
+    reconnected to, leaving the unsent messages in ``pending``.
+    """
+    retrying = None
+    while pending:
+        delivered = []
+        try:
+            connection.send_messages(_track(pending, delivered))
+        except Exception as e:
+            sent += delivered
+            del pending[:len(delivered)]
+            if pending and pending[0] is retrying:
+                failed.append(pending.pop(0))
+                logger.error(f"Giving up on email to {', '.join(failed[-1].to)}: {e}")
+            elif pending:
+                retrying = pending[0]
+            logger.warning(f"Email send failed, reconnecting: {e}")
+            connection.close()
+            connection.open()
+        else:
+            sent += delivered
+            del pending[:len(delivered)]
+
+
+def send_batched(messages, batch_size=None, connection=None):
+    """
+    Send ``messages`` over one connection, ``batch_size`` at a time.
+
+    Returns a dict with the ``sent`` and ``failed`` messages and a
+    ``batches`` list of per-batch counts, durations and messages/second.
+    """
+    batch_size = batch_size or getattr(settings, 'EMAIL_BATCH_SIZE', 100)
+    connection = connection or get_connection()
+    sent, failed, batches = [], [], []
+    pending = list(messages)
+    batch = []
+
+    try:
+        connection.open()
+        while pending:
+            batch, pending = pending[:batch_size], pending[batch_size:]
+            sent_before, failed_before = len(sent), len(failed)
+            started = time.perf_counter()
+            try:
+                _send_batch(connection, batch, sent, failed)
+            finally:
+                seconds = time.perf_counter() - started
+                stats = {
+                    'batch': len(batches) + 1,
+                    'sent': len(sent) - sent_before,
+                    'failed': len(failed) - failed_before,
+                    'seconds': round(seconds, 3),
+                    'per_second': round((len(sent) - sent_before) / seconds, 1) if seconds else None,
+                }
+                batches.append(stats)
+                logger.info(
+                    f"Email batch {stats['batch']}: {stats['sent']} sent, {stats['failed']} failed "
+                    f"in {seconds:.2f}s ({stats['per_second']}/s)"
+                )
+    except Exception as e:
+        # The server is unreachable: nothing still pending can be sent
+        failed += batch + pending
+        logger.error(f"Email connection failed, {len(batch) + len(pending)} messages not sent: {e}")
+    finally:
+        connection.close()
+
+    return {'sent': sent, 'failed': failed, 'batches': batches}
@@ -0,0 +1,53 @@
+"""
+Django management command to manage the PostgreSQL partitions of the API log table.
+Usage: python manage.py api_log_partitions [--convert] [--create] [--drop-expired] [--list]
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api import partitioning
+
+
+class Command(BaseCommand):
+    help = 'Convert the API log table to time partitions and maintain them (PostgreSQL only)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true', help='Rebuild the table as a partitioned table')
+        parser.add_argument(
+            '--period', choices=[partitioning.DAY, partitioning.MONTH],
+            help='Partition size (defaults to API_LOG_PARTITION_PERIOD)',
+        )
+        parser.add_argument('--create', action='store_true', help='Create upcoming partitions')
+        parser.add_argument('--ahead', type=int, help='Future partitions to create (defaults to API_LOG_PARTITIONS_AHEAD)')
+        parser.add_argument('--drop-expired', action='store_true', help='Drop partitions past API_LOG_RETENTION_DAYS')
+        parser.add_argument('--list', action='store_true', help='List partitions')
+
+    def handle(self, *args, **options):
+        if not partitioning.is_supported():
+            raise CommandError('API log partitioning requires PostgreSQL')
+
+        if options['convert']:
+            self.stdout.write('Converting API log table, this locks it until the copy finishes...')
+            if partitioning.convert_to_partitioned(period=options['period'], ahead=options['ahead']):
+                self.stdout.write(self.style.SUCCESS('API log table is now partitioned'))
+            else:
+                self.stdout.write(self.style.WARNING('API log table is already partitioned'))
+
+        if not partitioning.is_partitioned():
+            raise CommandError('API log table is not partitioned; run with --convert first')
+
+        if options['create']:
+            created = partitioning.ensure_partitions(ahead=options['ahead'], period=options['period'])
+            self.stdout.write(self.style.SUCCESS(f'Created {len(created)} partitions'))
+
+        if options['drop_expired']:
+            cutoff = timezone.now() - timedelta(days=settings.API_LOG_RETENTION_DAYS)
+            dropped_rows = partitioning.drop_expired_partitions(cutoff)
+            self.stdout.write(self.style.SUCCESS(f'Dropped expired partitions (~{dropped_rows} rows)'))
+
+        if options['list']:
+            for name, start, end, estimated_rows in partitioning.list_partitions():
+                self.stdout.write(f'{name:<30} {start:%Y-%m-%d} .. {end:%Y-%m-%d}  ~{estimated_rows} rows')
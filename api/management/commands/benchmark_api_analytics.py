@@ -0,0 +1,64 @@
+"""
+Django management command to check that process_api_analytics stays fast and
+memory-bounded as the log table grows.
+Usage: python manage.py benchmark_api_analytics --sizes 100000,1000000,10000000
+"""
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from api.benchmarks import benchmark_database, seed_api_logs
+from api.rollups import refresh_rollups
+from api.tasks import process_api_analytics
+
+
+class Command(BaseCommand):
+    help = 'Benchmark process_api_analytics on growing seeded log tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='100000,1000000,10000000',
+            help='Comma-separated table sizes to measure, in ascending order',
+        )
+        parser.add_argument(
+            '--source', choices=['raw', 'rollups'], default='raw',
+            help='API_ANALYTICS_SOURCE to benchmark',
+        )
+        parser.add_argument(
+            '--max-memory-mb', type=float, default=50.0,
+            help='Fail if peak Python memory of one run exceeds this',
+        )
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        results = []
+
+        with benchmark_database(), override_settings(API_ANALYTICS_SOURCE=options['source']):
+            seeded = 0
+            for size in sizes:
+                self.stdout.write(f'Seeding up to {size:,} rows...')
+                # All rows fall inside the 7-day analytics window
+                seeded += seed_api_logs(size - seeded, days=7, users=1000 if not seeded else 0)
+                if options['source'] == 'rollups':
+                    # Rollups are kept current by the scheduled refresh, not by the report
+                    refresh_rollups()
+
+                tracemalloc.start()
+                start = time.perf_counter()
+                process_api_analytics()
+                elapsed = time.perf_counter() - start
+                peak_mb = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+                tracemalloc.stop()
+                results.append((size, elapsed, peak_mb))
+
+        self.stdout.write(self.style.SUCCESS(f"\n{'rows':>12} {'time':>10} {'peak memory':>13}"))
+        for size, elapsed, peak_mb in results:
+            self.stdout.write(f'{size:>12,} {elapsed:>9.2f}s {peak_mb:>10.2f} MB')
+
+        worst = max(peak_mb for _, _, peak_mb in results)
+        if worst > options['max_memory_mb']:
+            raise CommandError(
+                f"Peak memory {worst:.2f} MB exceeds {options['max_memory_mb']:.2f} MB"
+            )
@@ -0,0 +1,75 @@
+"""
+Django management command to benchmark the ApiLog queries used by the API,
+the admin and the Celery tasks, with and without the ApiLog indexes.
+Usage: python manage.py benchmark_api_log_queries --rows 2000000
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from api.benchmarks import benchmark_database, seed_api_logs, time_call
+from api.models import ApiLog
+
+
+class Command(BaseCommand):
+    help = 'Benchmark ApiLog queries on a seeded throwaway database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2_000_000, help='Number of log rows to seed')
+        parser.add_argument('--days', type=int, default=30, help='Days of traffic to spread the rows over')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per query (median is reported)')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.stdout.write(f"Seeding {options['rows']:,} API logs...")
+            seed_api_logs(options['rows'], days=options['days'], progress=self.progress)
+            self.analyze()
+
+            with_indexes = self.run_queries(options['repeat'])
+            with connection.schema_editor() as editor:
+                for index in ApiLog._meta.indexes:
+                    editor.remove_index(ApiLog, index)
+            self.analyze()
+            without_indexes = self.run_queries(options['repeat'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"\n{'Query':<45} {'no indexes':>12} {'indexed':>12} {'speedup':>9}"
+        ))
+        for name, indexed_ms in with_indexes.items():
+            plain_ms = without_indexes[name]
+            speedup = plain_ms / indexed_ms if indexed_ms else float('inf')
+            self.stdout.write(f"{name:<45} {plain_ms:>10.1f}ms {indexed_ms:>10.1f}ms {speedup:>8.1f}x")
+
+    def progress(self, created):
+        if created % 500_000 == 0:
+            self.stdout.write(f'  {created:,} rows')
+
+    def analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {ApiLog._meta.db_table}')
+
+    def run_queries(self, repeat):
+        now = timezone.now()
+        day_ago = now - timedelta(days=1)
+        week_ago = now - timedelta(days=7)
+        cutoff = now - timedelta(days=25)
+        user_id = ApiLog.objects.filter(user__isnull=False).values_list('user_id', flat=True).first()
+
+        queries = {
+            'list view: latest 100': lambda: list(ApiLog.objects.all()[:100]),
+            'daily report: timestamp__range count': lambda: ApiLog.objects.filter(
+                timestamp__range=[day_ago, now]).count(),
+            'cleanup: timestamp__lt count': lambda: ApiLog.objects.filter(
+                timestamp__lt=cutoff).count(),
+            'endpoint over last 7 days': lambda: ApiLog.objects.filter(
+                endpoint='/api/login/', timestamp__gte=week_ago).count(),
+            'admin: user filter, latest 25': lambda: list(ApiLog.objects.filter(
+                user_id=user_id)[:25]),
+            'admin: status filter, latest 25': lambda: list(ApiLog.objects.filter(
+                response_status=500)[:25]),
+            'errors over last day': lambda: ApiLog.objects.filter(
+                response_status__gte=500, timestamp__gte=day_ago).count(),
+        }
+        return {name: time_call(query, repeat) for name, query in queries.items()}
@@ -0,0 +1,100 @@
+"""
+Django management command to measure /api/login/ throughput per CPU core for
+each password hasher, and the cost of the transparent rehash on first login
+after the hasher changes.
+Usage: python manage.py benchmark_login --logins 200 --hashers argon2,pbkdf2
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from api.benchmarks import benchmark_database, time_call
+
+PASSWORD = 'benchmark-password-123'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark login throughput per core for each password hasher'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=200, help='Logins per hasher')
+        parser.add_argument('--users', type=int, default=20, help='Distinct users to log in as')
+        parser.add_argument(
+            '--hashers', default=','.join(settings.PASSWORD_HASHER_CLASSES),
+            help='Comma-separated PASSWORD_HASHER names to compare'
+        )
+
+    def handle(self, *args, **options):
+        names = [name.strip() for name in options['hashers'].split(',') if name.strip()]
+        unknown = set(names) - set(settings.PASSWORD_HASHER_CLASSES)
+        if unknown:
+            raise CommandError(f"Unknown hashers: {', '.join(sorted(unknown))}")
+
+        results = []
+        with benchmark_database():
+            for name in names:
+                with self.preferring(name):
+                    users = self.create_users(f'{name}_', options['users'], make_password(PASSWORD))
+                    verify_ms = time_call(lambda: check_password(PASSWORD, users[0].password), 5)
+                    results.append((f'{name}: steady state', verify_ms, *self.run_logins(users, options['logins'])))
+
+            if len(names) > 1:
+                # Users hashed with the second hasher log in while the first is
+                # preferred: each first login verifies, rehashes and saves.
+                with self.preferring(names[1]):
+                    encoded = make_password(PASSWORD)
+                with self.preferring(names[0]):
+                    users = self.create_users('rehash_', options['users'], encoded)
+                    stats = self.run_logins(users, len(users))
+                    rehashed = User.objects.filter(
+                        username__startswith='rehash_', password__startswith=names[0]
+                    ).count()
+                results.append((f'{names[1]} -> {names[0]}: first login', None, *stats))
+                self.stdout.write(f'Rehashed on first login: {rehashed}/{len(users)} users')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"\n{'Scenario':<32} {'verify':>10} {'logins/s':>10} {'per core':>10} {'p50':>9}"
+        ))
+        for scenario, verify_ms, wall_rate, core_rate, p50_ms in results:
+            verify = f'{verify_ms:.1f}ms' if verify_ms is not None else '-'
+            self.stdout.write(
+                f'{scenario:<32} {verify:>10} {wall_rate:>10.1f} {core_rate:>10.1f} {p50_ms:>7.1f}ms'
+            )
+
+    def preferring(self, name):
+        """Settings override that makes ``name`` the hasher for new hashes."""
+        preferred = settings.PASSWORD_HASHER_CLASSES[name]
+        hashers = [preferred] + [path for path in settings.PASSWORD_HASHERS if path != preferred]
+        return override_settings(PASSWORD_HASHER=name, PASSWORD_HASHERS=hashers)
+
+    def create_users(self, prefix, count, encoded):
+        User.objects.bulk_create([
+            User(username=f'{prefix}{i}', email=f'{prefix}{i}@example.com', password=encoded)
+            for i in range(count)
+        ])
+        return list(User.objects.filter(username__startswith=prefix).order_by('id'))
+
+    def run_logins(self, users, logins):
+        """Return (logins/sec wall clock, logins/sec per core, median ms)."""
+        client = APIClient()
+        durations = []
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            wall_start, cpu_start = time.perf_counter(), time.process_time()
+            for i in range(logins):
+                started = time.perf_counter()
+                response = client.post(
+                    '/api/login/', {'username': users[i % len(users)].username, 'password': PASSWORD},
+                    format='json'
+                )
+                durations.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    raise CommandError(f'Login failed with status {response.status_code}')
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+        durations.sort()
+        return logins / wall, logins / cpu if cpu else float('inf'), durations[len(durations) // 2] * 1000
@@ -0,0 +1,41 @@
+"""
+Middleware for the api app.
+"""
+import logging
+import time
+
+from django.conf import settings
+
+from .log_writer import build_log_record, get_log_sink
+
+logger = logging.getLogger(__name__)
+
+
+class ApiLogMiddleware:
+    """
+    Log every request under API_LOG_PATH_PREFIXES to the ApiLog sink.
+
+    Place it first in MIDDLEWARE so the measured response time covers the
+    whole middleware chain, not only the view.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.path_prefixes = tuple(getattr(settings, 'API_LOG_PATH_PREFIXES', ['/api/']))
+
+    def __call__(self, request):
+        if not request.path.startswith(self.path_prefixes):
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        # Tells ApiLogMixin that this request is already being logged.
+        request._api_log_middleware = True
+        response = self.get_response(request)
+        response_time = time.perf_counter() - start
+
+        try:
+            get_log_sink().write(build_log_record(request, response, response_time))
+        except Exception as e:
+            # Don't let logging errors break the API
+            logger.error(f"Logging error: {e}")
+        return response
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:18
+
+from django.db import migrations, models
+
+from api.migration_operations import AddIndexConcurrentlyOnPostgres
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('api', '0002_alter_apilog_timestamp'),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyOnPostgres(
+            model_name='apilog',
+            index=models.Index(fields=['timestamp'], name='apilog_timestamp_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='apilog',
+            index=models.Index(fields=['endpoint', 'timestamp'], name='apilog_endpoint_ts_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='apilog',
+            index=models.Index(fields=['user', 'timestamp'], name='apilog_user_ts_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='apilog',
+            index=models.Index(fields=['response_status', 'timestamp'], name='apilog_status_ts_idx'),
+        ),
+    ]
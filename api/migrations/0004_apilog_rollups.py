@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_apilog_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApiLogRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('minute', 'Minute'), ('hour', 'Hour')], max_length=10)),
+                ('bucket_start', models.DateTimeField()),
+                ('endpoint', models.CharField(max_length=200)),
+                ('response_status', models.IntegerField()),
+                ('request_count', models.PositiveIntegerField(default=0)),
+                ('error_count', models.PositiveIntegerField(default=0, help_text='Requests with status >= 400')),
+                ('response_time_sum', models.FloatField(default=0, help_text='Sum of response times in seconds')),
+                ('response_time_min', models.FloatField(blank=True, null=True)),
+                ('response_time_max', models.FloatField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'API Log Rollup',
+                'verbose_name_plural': 'API Log Rollups',
+                'ordering': ['-bucket_start'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='apilogrollup',
+            constraint=models.UniqueConstraint(fields=('granularity', 'bucket_start', 'endpoint', 'response_status'), name='apilog_rollup_unique_bucket'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_apilog_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apilogrollup',
+            name='latency_sketch',
+            field=models.JSONField(blank=True, default=dict, help_text='DDSketch of response times'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:10
+
+from django.db import migrations, models
+
+from api.migration_operations import AddIndexConcurrentlyOnPostgres, RemoveIndexConcurrentlyOnPostgres
+
+
+class Migration(migrations.Migration):
+
+    # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('api', '0005_apilogrollup_latency_sketch'),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyOnPostgres(
+            model_name='apilog',
+            index=models.Index(fields=['timestamp', 'id'], name='apilog_timestamp_id_idx'),
+        ),
+        RemoveIndexConcurrentlyOnPostgres(
+            model_name='apilog',
+            name='apilog_timestamp_idx',
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:40
+
+from django.conf import settings
+from django.db import migrations
+
+
+def create_missing_profiles(apps, schema_editor):
+    """Profiles are now created with their user; backfill older users."""
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    UserProfile = apps.get_model('api', 'UserProfile')
+    missing = User.objects.filter(userprofile__isnull=True).values_list('id', flat=True).iterator()
+    batch = []
+    for user_id in missing:
+        batch.append(UserProfile(user_id=user_id))
+        if len(batch) == 1000:
+            UserProfile.objects.bulk_create(batch)
+            batch = []
+    UserProfile.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_apilog_timestamp_id_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(create_missing_profiles, migrations.RunPython.noop),
+    ]
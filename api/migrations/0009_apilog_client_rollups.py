@@ -0,0 +1,76 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:24
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncHour, TruncMinute
+from django.utils import timezone
+import django.db.models.deletion
+
+
+def backfill_client_rollups(apps, schema_editor):
+    """Build client rollups for the logs already folded into the endpoint rollups."""
+    ApiLog = apps.get_model('api', 'ApiLog')
+    ApiLogClientRollup = apps.get_model('api', 'ApiLogClientRollup')
+    RollupWatermark = apps.get_model('api', 'RollupWatermark')
+    watermark = RollupWatermark.objects.filter(name='api_log_rollups').first()
+    if watermark is None:
+        return
+
+    logs = ApiLog.objects.filter(id__lte=watermark.last_id)
+    minute_cutoff = timezone.now() - timedelta(days=getattr(settings, 'API_ROLLUP_MINUTE_RETENTION_DAYS', 8))
+    for granularity, trunc, source in (
+        ('hour', TruncHour, logs),
+        ('minute', TruncMinute, logs.filter(timestamp__gte=minute_cutoff)),
+    ):
+        groups = (
+            source.annotate(bucket=trunc('timestamp'))
+            .order_by()
+            .values('bucket', 'user_id', 'ip_address')
+            .annotate(request_count=Count('id'))
+            .iterator()
+        )
+        batch = []
+        for group in groups:
+            batch.append(ApiLogClientRollup(
+                granularity=granularity,
+                bucket_start=group['bucket'],
+                user_id=group['user_id'],
+                ip_address=group['ip_address'],
+                request_count=group['request_count'],
+            ))
+            if len(batch) == 1000:
+                ApiLogClientRollup.objects.bulk_create(batch)
+                batch = []
+        ApiLogClientRollup.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('api', '0008_email_delivery'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApiLogClientRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('minute', 'Minute'), ('hour', 'Hour')], max_length=10)),
+                ('bucket_start', models.DateTimeField()),
+                ('ip_address', models.GenericIPAddressField()),
+                ('request_count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'API Log Client Rollup',
+                'verbose_name_plural': 'API Log Client Rollups',
+                'ordering': ['-bucket_start'],
+                'indexes': [models.Index(fields=['granularity', 'bucket_start'], name='apilog_client_rollup_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_client_rollups, migrations.RunPython.noop),
+    ]
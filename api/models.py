@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 
 class UserProfile(models.Model):
@@ -26,7 +27,8 @@ class ApiLog(models.Model):
     method = models.CharField(max_length=10)
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     ip_address = models.GenericIPAddressField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set explicitly by the log sinks so buffered rows keep the request time.
+    timestamp = models.DateTimeField(default=timezone.now)
     response_status = models.IntegerField()
     response_time = models.FloatField(help_text="Response time in seconds")
 
@@ -37,3 +39,117 @@ class ApiLog(models.Model):
         verbose_name = "API Log"
         verbose_name_plural = "API Logs"
         ordering = ['-timestamp']
+        indexes = [
+            # Keyset pagination on (timestamp, id) in the log API, and the
+            # timestamp__range/__lt scans in the tasks
+            models.Index(fields=['timestamp', 'id'], name='apilog_timestamp_id_idx'),
+            models.Index(fields=['endpoint', 'timestamp'], name='apilog_endpoint_ts_idx'),
+            models.Index(fields=['user', 'timestamp'], name='apilog_user_ts_idx'),
+            models.Index(fields=['response_status', 'timestamp'], name='apilog_status_ts_idx'),
+        ]
+
+
+class ApiLogRollup(models.Model):
+    """Pre-aggregated ApiLog statistics per time bucket, endpoint and status."""
+    MINUTE = 'minute'
+    HOUR = 'hour'
+    GRANULARITY_CHOICES = [
+        (MINUTE, 'Minute'),
+        (HOUR, 'Hour'),
+    ]
+
+    granularity = models.CharField(max_length=10, choices=GRANULARITY_CHOICES)
+    bucket_start = models.DateTimeField()
+    endpoint = models.CharField(max_length=200)
+    response_status = models.IntegerField()
+    request_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0, help_text="Requests with status >= 400")
+    response_time_sum = models.FloatField(default=0, help_text="Sum of response times in seconds")
+    response_time_min = models.FloatField(null=True, blank=True)
+    response_time_max = models.FloatField(null=True, blank=True)
+    latency_sketch = models.JSONField(default=dict, blank=True, help_text="DDSketch of response times")
+
+    def __str__(self):
+        return f"{self.bucket_start:%Y-%m-%d %H:%M} {self.endpoint} {self.response_status} ({self.request_count})"
+
+    @property
+    def avg_response_time(self):
+        return self.response_time_sum / self.request_count if self.request_count else 0
+
+    class Meta:
+        verbose_name = "API Log Rollup"
+        verbose_name_plural = "API Log Rollups"
+        ordering = ['-bucket_start']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['granularity', 'bucket_start', 'endpoint', 'response_status'],
+                name='apilog_rollup_unique_bucket',
+            ),
+        ]
+
+
+class ApiLogClientRollup(models.Model):
+    """
+    ApiLog request counts per time bucket, user and IP address.
+
+    Distinct users and IPs and the busiest user of any window are read from
+    these rows, whose number grows with the active clients, not the requests.
+    """
+    MINUTE = ApiLogRollup.MINUTE
+    HOUR = ApiLogRollup.HOUR
+
+    granularity = models.CharField(max_length=10, choices=ApiLogRollup.GRANULARITY_CHOICES)
+    bucket_start = models.DateTimeField()
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    ip_address = models.GenericIPAddressField()
+    request_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.bucket_start:%Y-%m-%d %H:%M} {self.user_id} {self.ip_address} ({self.request_count})"
+
+    class Meta:
+        verbose_name = "API Log Client Rollup"
+        verbose_name_plural = "API Log Client Rollups"
+        ordering = ['-bucket_start']
+        indexes = [
+            models.Index(fields=['granularity', 'bucket_start'], name='apilog_client_rollup_idx'),
+        ]
+
+
+class RollupWatermark(models.Model):
+    """Highest ApiLog id already folded into the rollups."""
+    name = models.CharField(max_length=100, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.last_id}"
+
+
+class EmailDelivery(models.Model):
+    """
+    Ledger of emails sent by the tasks, one row per message and recipient.
+    ``message_key`` is the idempotency key of the task that sent it.
+    """
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    ]
+
+    message_key = models.CharField(max_length=100)
+    recipient = models.EmailField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.message_key} -> {self.recipient}: {self.status}"
+
+    class Meta:
+        verbose_name = "Email Delivery"
+        verbose_name_plural = "Email Deliveries"
+        constraints = [
+            models.UniqueConstraint(fields=['message_key', 'recipient'], name='email_delivery_unique_recipient'),
+        ]
@@ -0,0 +1,101 @@
+"""
+Enqueue Celery tasks once the surrounding transaction commits.
+
+``task.delay()`` publishes to the broker straight away: a worker may run the
+task before the rows it reads are committed, or for rows that are later
+rolled back, and the broker round trip is added to the request's latency.
+``enqueue(task, *args, **kwargs)`` registers the task with
+``transaction.on_commit`` instead and hands it to the publisher chosen by
+the ``API_TASK_PUBLISHER`` setting:
+
+- ``api.outbox.BufferedTaskPublisher`` (default) queues tasks in-process and
+  publishes them in batches over one broker connection from a background
+  thread.
+- ``api.outbox.DirectTaskPublisher`` publishes each task as soon as its
+  transaction commits.
+
+Outside an atomic block the task is handed over immediately. Like buffered
+API logs, tasks still queued in memory are lost if the process is killed.
+"""
+import logging
+
+from celery import current_app
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .batching import BackgroundBatcher
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TASK_PUBLISHER = 'api.outbox.BufferedTaskPublisher'
+
+_publisher = None
+
+
+def enqueue(task, *args, **kwargs):
+    """Publish ``task(*args, **kwargs)`` after the current transaction commits."""
+    signature = task.s(*args, **kwargs)
+    transaction.on_commit(lambda: get_task_publisher().publish(signature))
+    return signature
+
+
+class TaskPublisher:
+    """Base class for task publishers."""
+
+    def publish(self, signature):
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+
+class DirectTaskPublisher(TaskPublisher):
+    """Publish every task with its own broker round trip."""
+
+    def publish(self, signature):
+        signature.apply_async()
+
+
+class BufferedTaskPublisher(TaskPublisher):
+    """Queue tasks and publish them in batches outside the request."""
+
+    def __init__(self):
+        self.batcher = BackgroundBatcher(
+            self.publish_batch,
+            batch_size=getattr(settings, 'API_TASK_BATCH_SIZE', 100),
+            flush_interval=getattr(settings, 'API_TASK_FLUSH_INTERVAL', 0.5),
+            max_queue_size=getattr(settings, 'API_TASK_MAX_QUEUE_SIZE', 10000),
+            name='api-task-publisher',
+        )
+
+    def publish(self, signature):
+        self.batcher.put(signature)
+
+    def flush(self):
+        self.batcher.flush()
+
+    def publish_batch(self, signatures):
+        with current_app.producer_or_acquire() as producer:
+            for signature in signatures:
+                signature.apply_async(producer=producer)
+        logger.debug(f"Published {len(signatures)} tasks")
+
+
+def get_task_publisher():
+    """Return the process-wide publisher configured by ``API_TASK_PUBLISHER``."""
+    global _publisher
+    if _publisher is None:
+        _publisher = import_string(getattr(settings, 'API_TASK_PUBLISHER', DEFAULT_TASK_PUBLISHER))()
+    return _publisher
+
+
+@receiver(setting_changed)
+def reset_task_publisher(setting, **kwargs):
+    """Rebuild the publisher when tests override its settings."""
+    global _publisher
+    if setting.startswith('API_TASK_') and _publisher is not None:
+        _publisher.flush()
+        _publisher = None
@@ -0,0 +1,215 @@
+"""
+Declarative range partitioning of the ApiLog table on PostgreSQL.
+
+Once ``convert_to_partitioned`` has run, api_apilog is partitioned by
+``timestamp`` into one table per day or month (API_LOG_PARTITION_PERIOD), so
+retention drops whole partitions instead of deleting rows and time-bounded
+report queries only scan the partitions they touch. Other backends keep the
+plain table and every function here is a no-op for them.
+"""
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+
+from .models import ApiLog
+
+logger = logging.getLogger(__name__)
+
+TABLE = ApiLog._meta.db_table
+DAY = 'day'
+MONTH = 'month'
+NAME_FORMATS = {DAY: '%Y%m%d', MONTH: '%Y%m'}
+
+
+def is_supported():
+    return connection.vendor == 'postgresql'
+
+
+def is_partitioned():
+    """Whether the ApiLog table is a partitioned table on this database."""
+    if not is_supported():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLE])
+        row = cursor.fetchone()
+    return bool(row) and row[0] == 'p'
+
+
+def partition_period():
+    return getattr(settings, 'API_LOG_PARTITION_PERIOD', MONTH)
+
+
+def period_start(moment, period):
+    """Start of the day/month (UTC) containing ``moment``."""
+    moment = moment.astimezone(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(day=1) if period == MONTH else moment
+
+
+def next_period(start, period):
+    if period == MONTH:
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def partition_name(start, period):
+    return f"{TABLE}_p{start.strftime(NAME_FORMATS[period])}"
+
+
+def parse_partition_name(name):
+    """Return ``(start, end)`` of a partition from its name, or None."""
+    if not name.startswith(f"{TABLE}_p"):
+        return None
+    suffix = name[len(f"{TABLE}_p"):]
+    # Day suffixes are YYYYMMDD and month suffixes YYYYMM
+    period = {8: DAY, 6: MONTH}.get(len(suffix))
+    if period is None or not suffix.isdigit():
+        return None
+    try:
+        start = datetime.strptime(suffix, NAME_FORMATS[period]).replace(tzinfo=dt_timezone.utc)
+    except ValueError:
+        return None
+    return start, next_period(start, period)
+
+
+def list_partitions():
+    """``[(name, start, end, estimated_rows)]`` of the range partitions, oldest first."""
+    if not is_partitioned():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname, child.reltuples
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = to_regclass(%s)
+            """,
+            [TABLE],
+        )
+        rows = cursor.fetchall()
+    partitions = []
+    for name, reltuples in rows:
+        bounds = parse_partition_name(name)
+        if bounds:
+            partitions.append((name, bounds[0], bounds[1], max(int(reltuples), 0)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def create_partition(cursor, start, period):
+    end = next_period(start, period)
+    cursor.execute(
+        f'CREATE TABLE IF NOT EXISTS "{partition_name(start, period)}" '
+        f'PARTITION OF "{TABLE}" FOR VALUES FROM (%s) TO (%s)',
+        [start, end],
+    )
+
+
+def ensure_partitions(ahead=None, period=None):
+    """Create partitions from the current period through ``ahead`` future ones."""
+    if not is_partitioned():
+        return []
+    period = period or partition_period()
+    ahead = getattr(settings, 'API_LOG_PARTITIONS_AHEAD', 3) if ahead is None else ahead
+    existing = {name for name, _, _, _ in list_partitions()}
+
+    created = []
+    start = period_start(datetime.now(dt_timezone.utc), period)
+    with connection.cursor() as cursor:
+        for _ in range(ahead + 1):
+            name = partition_name(start, period)
+            if name not in existing:
+                try:
+                    with transaction.atomic():
+                        create_partition(cursor, start, period)
+                    created.append(name)
+                except DatabaseError as e:
+                    # Usually rows for this range already landed in the
+                    # default partition; they must be moved by hand first.
+                    logger.error(f"Could not create API log partition {name}: {e}")
+            start = next_period(start, period)
+    if created:
+        logger.info(f"Created API log partitions: {', '.join(created)}")
+    return created
+
+
+def drop_expired_partitions(cutoff):
+    """
+    Detach and drop partitions that end at or before ``cutoff``.
+
+    Returns the estimated number of rows removed, taken from the planner
+    statistics so the drop itself stays constant-time.
+    """
+    dropped_rows = 0
+    for name, _, end, estimated_rows in list_partitions():
+        if end > cutoff:
+            continue
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{name}"')
+            cursor.execute(f'DROP TABLE "{name}"')
+        dropped_rows += estimated_rows
+        logger.info(f"Dropped API log partition {name} (~{estimated_rows} rows)")
+    return dropped_rows
+
+
+def convert_to_partitioned(period=None, ahead=None):
+    """
+    Rebuild api_apilog as a table partitioned by range on ``timestamp``.
+
+    Existing rows are copied into day/month partitions inside one
+    transaction that holds an exclusive lock on the table, so run it in a
+    maintenance window. The primary key becomes ``(id, timestamp)`` because
+    PostgreSQL requires the partition key in every unique constraint; ids
+    keep coming from a sequence and stay unique.
+    """
+    if not is_supported():
+        raise RuntimeError("API log partitioning requires PostgreSQL")
+    if is_partitioned():
+        return False
+    period = period or partition_period()
+    legacy = f"{TABLE}_legacy"
+    sequence = f"{TABLE}_id_seq"
+    user_field = ApiLog._meta.get_field('user')
+    user_table = user_field.related_model._meta.db_table
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE "{TABLE}" IN ACCESS EXCLUSIVE MODE')
+            cursor.execute(f'ALTER TABLE "{TABLE}" RENAME TO "{legacy}"')
+            cursor.execute(
+                f'CREATE TABLE "{TABLE}" (LIKE "{legacy}" INCLUDING DEFAULTS) '
+                f'PARTITION BY RANGE ("timestamp")'
+            )
+
+            # Partitions for every period that already holds rows, plus a
+            # default partition so an insert never fails for lack of one
+            cursor.execute(f'SELECT MIN("timestamp") FROM "{legacy}"')
+            oldest = cursor.fetchone()[0] or datetime.now(dt_timezone.utc)
+            start = period_start(oldest, period)
+            current = period_start(datetime.now(dt_timezone.utc), period)
+            while start <= current:
+                create_partition(cursor, start, period)
+                start = next_period(start, period)
+            cursor.execute(f'CREATE TABLE "{TABLE}_default" PARTITION OF "{TABLE}" DEFAULT')
+
+            cursor.execute(f'INSERT INTO "{TABLE}" SELECT * FROM "{legacy}"')
+            cursor.execute(f'DROP TABLE "{legacy}"')
+
+            cursor.execute(f'CREATE SEQUENCE "{sequence}" OWNED BY "{TABLE}"."id"')
+            cursor.execute(f'ALTER TABLE "{TABLE}" ALTER COLUMN "id" SET DEFAULT nextval(%s)', [sequence])
+            cursor.execute(f'SELECT setval(%s, COALESCE(MAX("id"), 0) + 1, false) FROM "{TABLE}"', [sequence])
+            cursor.execute(f'ALTER TABLE "{TABLE}" ADD PRIMARY KEY ("id", "timestamp")')
+            cursor.execute(
+                f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{TABLE}_{user_field.column}_fk" '
+                f'FOREIGN KEY ("{user_field.column}") REFERENCES "{user_table}" ("id") '
+                f'DEFERRABLE INITIALLY DEFERRED'
+            )
+
+        # Created on the parent, so PostgreSQL builds them on every partition
+        with connection.schema_editor() as editor:
+            for index in ApiLog._meta.indexes:
+                editor.add_index(ApiLog, index)
+
+    ensure_partitions(ahead=ahead, period=period)
+    logger.info(f"Converted {TABLE} to {period} partitions")
+    return True
@@ -0,0 +1,33 @@
+"""
+Cross-request cache of ``User.get_all_permissions()``.
+
+Django only memoizes permissions on the user instance, which lives for one
+request. This keeps the set in the shared project cache by user id; the
+receivers in api.signals drop it when the user's permissions, groups or
+flags change.
+"""
+from django.conf import settings
+
+from django_internship import cache
+
+NAMESPACE = 'user_permissions'
+
+
+def get_all_permissions(user):
+    """Cached equivalent of ``user.get_all_permissions()``."""
+    if not user.is_active or user.is_anonymous:
+        return set()
+    # Deferred so a lazily loaded user is only fetched on a cache miss
+    return cache.get_or_set(
+        NAMESPACE, user.pk, lambda: user.get_all_permissions(),
+        getattr(settings, 'API_PERMISSION_CACHE_TIMEOUT', 300),
+    )
+
+
+def forget_permissions(user_id):
+    cache.delete(NAMESPACE, user_id)
+
+
+def forget_all_permissions():
+    """Used when a group or permission change can affect many users."""
+    cache.invalidate(NAMESPACE)
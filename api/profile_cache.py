@@ -0,0 +1,31 @@
+"""
+Optional per-user cache of the serialized profile served by /api/profile/.
+
+Enabled when API_PROFILE_CACHE_TIMEOUT is above zero. The receivers in
+api.signals drop a user's entry whenever their profile or user is saved.
+"""
+from django.conf import settings
+
+from django_internship import cache
+
+NAMESPACE = 'user_profile'
+
+
+def is_enabled():
+    return getattr(settings, 'API_PROFILE_CACHE_TIMEOUT', 0) > 0
+
+
+def get_profile_data(user_id):
+    if not is_enabled():
+        return None
+    return cache.get(NAMESPACE, user_id)
+
+
+def set_profile_data(user_id, data):
+    if is_enabled():
+        cache.set(NAMESPACE, user_id, dict(data), settings.API_PROFILE_CACHE_TIMEOUT)
+
+
+def forget_profile(user_id):
+    if is_enabled():
+        cache.delete(NAMESPACE, user_id)
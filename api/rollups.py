@@ -0,0 +1,366 @@
+"""
+Incremental per-minute and per-hour rollups of ApiLog.
+
+``refresh_rollups`` folds every log row above the stored high-water mark into
+ApiLogRollup, so each run only reads the rows written since the previous one
+and reports can aggregate a handful of rollup rows instead of raw logs. Each
+rollup also carries a DDSketch of its response times, so latency percentiles
+for any window come from merging sketches rather than sorting raw rows.
+ApiLogClientRollup counts the same rows per user and IP address, for the
+distinct-client figures that cannot be summed across endpoint rollups.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Max, Min, Q, Sum, Value, When
+from django.db.models.functions import Cast, Ceil, Ln, TruncMinute
+from django.utils import timezone
+
+from .models import ApiLog, ApiLogClientRollup, ApiLogRollup, RollupWatermark
+from .sketches import DEFAULT_RELATIVE_ACCURACY, MIN_INDEXABLE_VALUE, DDSketch, log_gamma
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = 'api_log_rollups'
+
+ROLLUP_FIELDS = [
+    'request_count', 'error_count', 'response_time_sum',
+    'response_time_min', 'response_time_max', 'latency_sketch',
+]
+
+
+def use_rollups():
+    """Whether the report tasks read from rollups rather than raw logs."""
+    return getattr(settings, 'API_ANALYTICS_SOURCE', 'rollups') == 'rollups'
+
+
+def refresh_rollups():
+    """
+    Fold new ApiLog rows into the rollups and return how many were processed.
+
+    Rows newer than API_ROLLUP_SETTLE_SECONDS are left for the next run so a
+    log batch that is still being committed is not skipped by the watermark.
+    """
+    batch_size = getattr(settings, 'API_ROLLUP_BATCH_SIZE', 50000)
+    settled_before = timezone.now() - timedelta(seconds=getattr(settings, 'API_ROLLUP_SETTLE_SECONDS', 30))
+    watermark, _ = RollupWatermark.objects.get_or_create(name=WATERMARK_NAME)
+    upper_id = ApiLog.objects.filter(
+        id__gt=watermark.last_id, timestamp__lte=settled_before
+    ).aggregate(upper_id=Max('id'))['upper_id']
+    if upper_id is None:
+        return 0
+
+    processed = 0
+    while True:
+        with transaction.atomic():
+            watermark = RollupWatermark.objects.select_for_update().get(name=WATERMARK_NAME)
+            if watermark.last_id >= upper_id:
+                break
+            high_id = min(watermark.last_id + batch_size, upper_id)
+            processed += _fold_logs(watermark.last_id, high_id)
+            watermark.last_id = high_id
+            watermark.save(update_fields=['last_id', 'updated_at'])
+
+    if processed:
+        logger.info(f"Rolled up {processed} API logs")
+    return processed
+
+
+def sketch_accuracy():
+    return getattr(settings, 'API_LATENCY_SKETCH_ACCURACY', DEFAULT_RELATIVE_ACCURACY)
+
+
+def sketch_key(accuracy):
+    """
+    SQL expression for the DDSketch bin of ``response_time``.
+
+    Grouping by it lets the database build sketches: each group's count is
+    the count of one bin, so no raw response times are read into Python.
+    """
+    return Case(
+        When(
+            response_time__gt=MIN_INDEXABLE_VALUE,
+            then=Ceil(Ln(F('response_time')) / Value(log_gamma(accuracy))),
+        ),
+        default=Value(None),
+        output_field=FloatField(),
+    )
+
+
+def latency_sketches(logs, group_by='endpoint'):
+    """DDSketch of response times per ``group_by`` value, built in SQL from raw logs."""
+    accuracy = sketch_accuracy()
+    sketches = {}
+    bins = (
+        logs.annotate(sketch_key=sketch_key(accuracy))
+        .order_by()
+        .values(group_by, 'sketch_key')
+        .annotate(count=Count('id'))
+    )
+    for row in bins:
+        key = None if row['sketch_key'] is None else int(row['sketch_key'])
+        sketches.setdefault(row[group_by], DDSketch(accuracy)).add_to_bin(key, row['count'])
+    return sketches
+
+
+def rollup_latency_sketches(rollups, group_by='endpoint'):
+    """DDSketch of response times per ``group_by`` value, merged from rollups."""
+    accuracy = sketch_accuracy()
+    sketches = {}
+    for group, data in rollups.values_list(group_by, 'latency_sketch').iterator():
+        sketch = sketches.setdefault(group, DDSketch(accuracy))
+        _merge_sketch(sketch, data)
+    return sketches
+
+
+def _merge_sketch(sketch, other):
+    """Merge a stored or in-memory sketch into ``sketch``, skipping incompatible ones."""
+    if not isinstance(other, DDSketch):
+        other = DDSketch.from_dict(other, sketch.relative_accuracy)
+    try:
+        sketch.merge(other)
+    except ValueError:
+        logger.warning("Skipping latency sketch built with a different accuracy")
+
+
+def _fold_logs(low_id, high_id):
+    """Add the logs with low_id < id <= high_id to the minute and hour rollups."""
+    accuracy = sketch_accuracy()
+    groups = (
+        ApiLog.objects.filter(id__gt=low_id, id__lte=high_id)
+        .annotate(bucket=TruncMinute('timestamp'), sketch_key=sketch_key(accuracy))
+        .order_by()
+        .values('bucket', 'endpoint', 'response_status', 'sketch_key')
+        .annotate(
+            request_count=Count('id'),
+            response_time_sum=Sum('response_time'),
+            response_time_min=Min('response_time'),
+            response_time_max=Max('response_time'),
+        )
+    )
+
+    deltas = {ApiLogRollup.MINUTE: {}, ApiLogRollup.HOUR: {}}
+    processed = 0
+    for group in groups:
+        processed += group['request_count']
+        group['error_count'] = group['request_count'] if group['response_status'] >= 400 else 0
+        group['latency_sketch'] = DDSketch(accuracy)
+        group['latency_sketch'].add_to_bin(
+            None if group['sketch_key'] is None else int(group['sketch_key']),
+            group['request_count'],
+        )
+        minute = group['bucket']
+        hour = minute.replace(minute=0)
+        for granularity, bucket in ((ApiLogRollup.MINUTE, minute), (ApiLogRollup.HOUR, hour)):
+            key = (bucket, group['endpoint'], group['response_status'])
+            _merge(deltas[granularity].setdefault(key, {}), group)
+
+    for granularity, changes in deltas.items():
+        if changes:
+            _apply(granularity, changes)
+    _fold_clients(low_id, high_id)
+    return processed
+
+
+def _fold_clients(low_id, high_id):
+    """Add the logs with low_id < id <= high_id to the client rollups."""
+    groups = (
+        ApiLog.objects.filter(id__gt=low_id, id__lte=high_id)
+        .annotate(bucket=TruncMinute('timestamp'))
+        .order_by()
+        .values('bucket', 'user_id', 'ip_address')
+        .annotate(request_count=Count('id'))
+    )
+
+    deltas = {ApiLogClientRollup.MINUTE: {}, ApiLogClientRollup.HOUR: {}}
+    for group in groups:
+        minute = group['bucket']
+        hour = minute.replace(minute=0)
+        for granularity, bucket in ((ApiLogClientRollup.MINUTE, minute), (ApiLogClientRollup.HOUR, hour)):
+            key = (bucket, group['user_id'], group['ip_address'])
+            deltas[granularity][key] = deltas[granularity].get(key, 0) + group['request_count']
+
+    for granularity, changes in deltas.items():
+        if changes:
+            _apply_clients(granularity, changes)
+
+
+def _apply_clients(granularity, changes):
+    """
+    Add ``changes`` (request counts keyed by bucket, user id, IP) to stored
+    client rollups.
+
+    The user column is nullable, so rows cannot be upserted on a unique key;
+    existing rows are updated and the rest created, under the watermark lock.
+    """
+    buckets = {bucket for bucket, _, _ in changes}
+    existing = ApiLogClientRollup.objects.filter(
+        granularity=granularity,
+        bucket_start__gte=min(buckets),
+        bucket_start__lte=max(buckets),
+        ip_address__in={ip_address for _, _, ip_address in changes},
+    ).only('bucket_start', 'user_id', 'ip_address', 'request_count')
+
+    updated = []
+    for row in existing:
+        count = changes.pop((row.bucket_start, row.user_id, row.ip_address), None)
+        if count is not None:
+            row.request_count += count
+            updated.append(row)
+
+    ApiLogClientRollup.objects.bulk_update(updated, ['request_count'], batch_size=500)
+    ApiLogClientRollup.objects.bulk_create(
+        [
+            ApiLogClientRollup(
+                granularity=granularity,
+                bucket_start=bucket,
+                user_id=user_id,
+                ip_address=ip_address,
+                request_count=count,
+            )
+            for (bucket, user_id, ip_address), count in changes.items()
+        ],
+        batch_size=500,
+    )
+
+
+def _merge(target, source):
+    """Merge rollup statistics from ``source`` into ``target`` in place."""
+    if not target:
+        target.update({field: source[field] for field in ROLLUP_FIELDS})
+        target['latency_sketch'] = DDSketch(sketch_accuracy())
+        _merge_sketch(target['latency_sketch'], source['latency_sketch'])
+        return
+    target['request_count'] += source['request_count']
+    target['error_count'] += source['error_count']
+    target['response_time_sum'] += source['response_time_sum']
+    target['response_time_min'] = min(target['response_time_min'], source['response_time_min'])
+    target['response_time_max'] = max(target['response_time_max'], source['response_time_max'])
+    _merge_sketch(target['latency_sketch'], source['latency_sketch'])
+
+
+def _apply(granularity, changes):
+    """
+    Add ``changes`` (keyed by bucket, endpoint, status) to stored rollups.
+
+    Existing rows are merged in Python and written back with a single upsert;
+    the watermark row lock keeps concurrent refreshes from interleaving.
+    """
+    buckets = {bucket for bucket, _, _ in changes}
+    existing = ApiLogRollup.objects.filter(
+        granularity=granularity,
+        bucket_start__gte=min(buckets),
+        bucket_start__lte=max(buckets),
+        endpoint__in={endpoint for _, endpoint, _ in changes},
+    ).values('bucket_start', 'endpoint', 'response_status', *ROLLUP_FIELDS)
+
+    for row in existing:
+        delta = changes.get((row['bucket_start'], row['endpoint'], row['response_status']))
+        if delta is not None:
+            _merge(delta, row)
+
+    ApiLogRollup.objects.bulk_create(
+        [
+            ApiLogRollup(
+                granularity=granularity,
+                bucket_start=bucket,
+                endpoint=endpoint,
+                response_status=status,
+                **dict(stats, latency_sketch=stats['latency_sketch'].to_dict()),
+            )
+            for (bucket, endpoint, status), stats in changes.items()
+        ],
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['granularity', 'bucket_start', 'endpoint', 'response_status'],
+        update_fields=ROLLUP_FIELDS,
+    )
+
+
+def rollups_between(start, end, model=ApiLogRollup):
+    """
+    Rollups of ``model`` covering ``start <= t < end`` at minute resolution.
+
+    Whole hours are read from the hour rollups and only the ragged edges of
+    the window from the minute rollups.
+    """
+    first_hour = start.replace(minute=0, second=0, microsecond=0)
+    if first_hour < start:
+        first_hour += timedelta(hours=1)
+    last_hour = end.replace(minute=0, second=0, microsecond=0)
+
+    if first_hour >= last_hour:
+        condition = Q(granularity=model.MINUTE, bucket_start__gte=start, bucket_start__lt=end)
+    else:
+        condition = (
+            Q(granularity=model.HOUR, bucket_start__gte=first_hour, bucket_start__lt=last_hour)
+            | Q(granularity=model.MINUTE, bucket_start__gte=start, bucket_start__lt=first_hour)
+            | Q(granularity=model.MINUTE, bucket_start__gte=last_hour, bucket_start__lt=end)
+        )
+    return model.objects.filter(condition)
+
+
+def client_rollups_between(start, end):
+    """Client rollups covering ``start <= t < end`` at minute resolution."""
+    return rollups_between(start, end, model=ApiLogClientRollup)
+
+
+def summarize_rollups(rollups):
+    """Total requests, errors and average response time of a rollup queryset."""
+    totals = rollups.aggregate(
+        total_requests=Sum('request_count'),
+        error_requests=Sum('error_count'),
+        response_time_sum=Sum('response_time_sum'),
+    )
+    total_requests = totals['total_requests'] or 0
+    return {
+        'total_requests': total_requests,
+        'error_requests': totals['error_requests'] or 0,
+        'avg_response_time': (totals['response_time_sum'] or 0) / total_requests if total_requests else 0,
+    }
+
+
+def summarize_client_rollups(client_rollups):
+    """Distinct users and IP addresses of a client rollup queryset."""
+    return client_rollups.aggregate(
+        unique_users=Count('user', distinct=True),
+        unique_ips=Count('ip_address', distinct=True),
+    )
+
+
+def most_active_user(client_rollups):
+    """Username and request count of the busiest user in a client rollup queryset."""
+    row = (
+        client_rollups.filter(user__isnull=False)
+        .order_by()
+        .values('user__username')
+        .annotate(request_count=Sum('request_count'))
+        .order_by('-request_count')
+        .first()
+    )
+    if not row:
+        return None
+    return {'username': row['user__username'], 'request_count': row['request_count']}
+
+
+def endpoint_rollups(rollups):
+    """Per-endpoint request counts and average response time, busiest first."""
+    return (
+        rollups.order_by()
+        .values('endpoint')
+        .annotate(
+            requests=Sum('request_count'),
+            avg_time=Sum('response_time_sum') / Cast(Sum('request_count'), FloatField()),
+        )
+        .order_by('-requests')
+    )
+
+
+def prune_minute_rollups(older_than):
+    """Delete minute rollups older than ``older_than``; hour rollups are kept."""
+    return sum(
+        model.objects.filter(granularity=model.MINUTE, bucket_start__lt=older_than).delete()[0]
+        for model in (ApiLogRollup, ApiLogClientRollup)
+    )
@@ -1,5 +1,10 @@
+from collections import Counter, OrderedDict
+
 from rest_framework import serializers
+from django.conf import settings
+from django.db.models import F
 from django.contrib.auth.models import User
+from django.contrib.auth.validators import UnicodeUsernameValidator
 from .models import UserProfile, ApiLog
 
 
@@ -31,6 +36,40 @@ class ApiLogSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'timestamp']
 
 
+class ApiLogValuesSerializer(serializers.BaseSerializer):
+    """
+    Read-only ApiLog serializer for ``values()`` rows.
+
+    Gives the same output as ApiLogSerializer without instantiating models;
+    build the queryset with ``ApiLogValuesSerializer.get_values(queryset)``.
+    """
+    timestamp_field = serializers.DateTimeField()
+
+    @staticmethod
+    def get_values(queryset):
+        return queryset.values(
+            'id', 'endpoint', 'method', 'user', 'ip_address', 'timestamp',
+            'response_status', 'response_time', user_username=F('user__username'),
+        )
+
+    def to_representation(self, row):
+        data = OrderedDict([
+            ('id', row['id']),
+            ('endpoint', row['endpoint']),
+            ('method', row['method']),
+            ('user', row['user']),
+            ('user_username', row['user_username']),
+            ('ip_address', row['ip_address']),
+            ('timestamp', self.timestamp_field.to_representation(row['timestamp'])),
+            ('response_status', row['response_status']),
+            ('response_time', row['response_time']),
+        ])
+        if row['user'] is None:
+            # ApiLogSerializer skips user_username for anonymous requests
+            del data['user_username']
+        return data
+
+
 class UserRegistrationSerializer(serializers.ModelSerializer):
     """Serializer for user registration."""
     password = serializers.CharField(write_only=True, min_length=8)
@@ -47,7 +86,33 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         validated_data.pop('password_confirm')
-        user = User.objects.create_user(**validated_data)
-        # Create user profile
-        UserProfile.objects.create(user=user)
-        return user
+        # The profile is created by the post_save receiver in api.signals
+        return User.objects.create_user(**validated_data)
+
+
+class BulkRegistrationEntrySerializer(UserRegistrationSerializer):
+    """
+    One entry of a bulk registration. Drops the per-entry username
+    UniqueValidator; BulkUserRegistrationSerializer checks the whole batch
+    in one query instead.
+    """
+    class Meta(UserRegistrationSerializer.Meta):
+        extra_kwargs = {'username': {'validators': [UnicodeUsernameValidator()]}}
+
+
+class BulkUserRegistrationSerializer(serializers.Serializer):
+    """Serializer for registering a list of users in one request."""
+    users = BulkRegistrationEntrySerializer(
+        many=True, allow_empty=False,
+        max_length=getattr(settings, 'API_BULK_REGISTRATION_MAX_USERS', 1000),
+    )
+    
+    def validate_users(self, users):
+        usernames = [entry['username'] for entry in users]
+        duplicates = sorted(name for name, count in Counter(usernames).items() if count > 1)
+        if duplicates:
+            raise serializers.ValidationError(f"Duplicate usernames: {', '.join(duplicates)}")
+        taken = sorted(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        if taken:
+            raise serializers.ValidationError(f"Usernames already taken: {', '.join(taken)}")
+        return users
@@ -0,0 +1,76 @@
+"""
+Signal receivers that keep the api app's caches consistent.
+"""
+from django.contrib.auth.models import Group, Permission, User
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from .authentication import forget_token
+from .models import UserProfile
+from .permission_cache import forget_all_permissions, forget_permissions
+from .profile_cache import forget_profile
+from .tokens import forget_user_token
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    forget_token(instance.key)
+    forget_user_token(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def create_user_profile(sender, instance, created, raw=False, **kwargs):
+    """Every user gets a profile, so profile reads never need get_or_create."""
+    if created and not raw:
+        UserProfile.objects.create(user=instance)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def forget_changed_profile(sender, instance, **kwargs):
+    forget_profile(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def refresh_changed_user(sender, instance, created, update_fields=None, **kwargs):
+    """Cached tokens, permissions and profiles carry user data; refresh them."""
+    if created or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    for key in Token.objects.filter(user=instance).values_list('key', flat=True):
+        forget_token(key)
+    # is_active/is_superuser feed into get_all_permissions()
+    forget_permissions(instance.pk)
+    # The profile response embeds the user's details, so its ETag and
+    # Last-Modified (derived from updated_at) must move with them
+    UserProfile.objects.filter(user_id=instance.pk).update(updated_at=timezone.now())
+    forget_profile(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def forget_deleted_user(sender, instance, **kwargs):
+    forget_permissions(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=User.groups.through)
+def forget_permissions_on_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        forget_permissions(instance.pk)
+    elif pk_set:
+        # Changed from the Permission/Group side: pk_set holds user ids
+        for user_id in pk_set:
+            forget_permissions(user_id)
+    else:
+        forget_all_permissions()
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def forget_permissions_on_group_change(sender, action='post_delete', **kwargs):
+    if action.startswith('post_'):
+        forget_all_permissions()
@@ -0,0 +1,103 @@
+"""
+DDSketch quantile sketch for response times.
+
+Values are counted in logarithmic bins so that any quantile is returned with
+a bounded relative error, and two sketches with the same accuracy merge by
+adding bin counts. This lets per-minute and per-hour rollups carry latency
+distributions that combine into p50/p95/p99 for any window without reading
+or sorting raw rows.
+"""
+import math
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+# Values at or below this (in seconds) are counted in the zero bin.
+MIN_INDEXABLE_VALUE = 1e-9
+
+
+def log_gamma(relative_accuracy):
+    """Natural log of the bin growth factor for ``relative_accuracy``."""
+    return math.log((1 + relative_accuracy) / (1 - relative_accuracy))
+
+
+class DDSketch:
+    """Mergeable quantile sketch with relative-error guarantees."""
+
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.bins = {}
+        self.zero_count = 0
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def count(self):
+        return self.zero_count + sum(self.bins.values())
+
+    def key(self, value):
+        """Bin index of ``value``; None for the zero bin."""
+        if value <= MIN_INDEXABLE_VALUE:
+            return None
+        return math.ceil(math.log(value) / self.log_gamma)
+
+    def add(self, value, count=1):
+        self.add_to_bin(self.key(value), count)
+
+    def add_to_bin(self, key, count):
+        """Add ``count`` values to bin ``key`` (None for the zero bin)."""
+        if key is None:
+            self.zero_count += count
+        else:
+            self.bins[key] = self.bins.get(key, 0) + count
+
+    def merge(self, other):
+        """Add the counts of ``other`` to this sketch."""
+        if not other.count:
+            return self
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        self.zero_count += other.zero_count
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        return self
+
+    def quantile(self, q):
+        """Estimated value at quantile ``q`` (0 <= q <= 1), or None if empty."""
+        total = self.count
+        if not total:
+            return None
+        rank = q * (total - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                # Midpoint of the bin (gamma^(k-1), gamma^k] in relative terms
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+    def percentiles(self, quantiles=(0.5, 0.95, 0.99)):
+        """Map like ``{'p50': ..., 'p95': ..., 'p99': ...}`` for ``quantiles``."""
+        return {f'p{q * 100:g}': self.quantile(q) for q in quantiles}
+
+    def to_dict(self):
+        """JSON-serialisable form, as stored on ApiLogRollup."""
+        if not self.count:
+            return {}
+        return {
+            'accuracy': self.relative_accuracy,
+            'zero': self.zero_count,
+            'bins': {str(key): count for key, count in self.bins.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        sketch = cls(data.get('accuracy', relative_accuracy) if data else relative_accuracy)
+        if data:
+            sketch.zero_count = data.get('zero', 0)
+            sketch.bins = {int(key): count for key, count in data.get('bins', {}).items()}
+        return sketch
@@ -1,8 +1,9 @@
-from celery import shared_task
-from django.core.mail import send_mail, EmailMultiAlternatives
+from celery import chord, group, shared_task
+from django.core.mail import send_mail, EmailMessage, EmailMultiAlternatives
 from django.template.loader import render_to_string
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.db.models import Avg, Count, Max, Q
 from django.utils import timezone
 from datetime import timedelta
 import logging
@@ -10,77 +11,110 @@ import time
 import json
 import requests
 
+from django_internship import cache
+
+from . import partitioning
+from .deliveries import invocation_key, send_each_once, send_once
+from .rollups import (
+    client_rollups_between,
+    endpoint_rollups,
+    latency_sketches,
+    most_active_user,
+    prune_minute_rollups,
+    refresh_rollups,
+    rollup_latency_sketches,
+    rollups_between,
+    summarize_client_rollups,
+    summarize_rollups,
+    use_rollups,
+)
+
 logger = logging.getLogger(__name__)
 
 
+def build_welcome_email(user):
+    """
+    Welcome email for ``user`` with plain text and HTML versions.
+    """
+    subject = 'Welcome to Django Internship API!'
+    
+    # Create both plain text and HTML versions
+    text_message = f"""
+    Hello {user.username}!
+    
+    Welcome to our Django Internship API platform. Your account has been successfully created.
+    
+    Here's what you can do now:
+    - Access protected endpoints using your authentication token
+    - View your profile at /api/profile/
+    - Explore the API documentation
+    
+    Account Details:
+    - Username: {user.username}
+    - Email: {user.email}
+    - Registration Date: {user.date_joined.strftime('%Y-%m-%d %H:%M:%S')}
+    
+    Best regards,
+    Django Internship Team
+    """
+    
+    html_message = f"""
+    <html>
+    <body>
+        <h2>Welcome to Django Internship API!</h2>
+        <p>Hello <strong>{user.username}</strong>!</p>
+        
+        <p>Welcome to our Django Internship API platform. Your account has been successfully created.</p>
+        
+        <h3>What you can do now:</h3>
+        <ul>
+            <li>Access protected endpoints using your authentication token</li>
+            <li>View your profile at <code>/api/profile/</code></li>
+            <li>Explore the API documentation</li>
+        </ul>
+        
+        <h3>Account Details:</h3>
+        <ul>
+            <li><strong>Username:</strong> {user.username}</li>
+            <li><strong>Email:</strong> {user.email}</li>
+            <li><strong>Registration Date:</strong> {user.date_joined.strftime('%Y-%m-%d %H:%M:%S')}</li>
+        </ul>
+        
+        <p>Best regards,<br>Django Internship Team</p>
+    </body>
+    </html>
+    """
+    
+    email = EmailMultiAlternatives(
+        subject=subject,
+        body=text_message,
+        from_email=settings.EMAIL_HOST_USER,
+        to=[user.email],
+    )
+    email.attach_alternative(html_message, "text/html")
+    return email
+
+
 @shared_task
-def send_welcome_email(user_id):
+def send_welcome_email(user_id, idempotency_key='welcome'):
     """
     Send welcome email to new user after registration.
     This is a background task that runs asynchronously.
+    Users already welcomed under ``<idempotency_key>:<user id>`` are not
+    emailed again.
     """
     try:
         user = User.objects.get(id=user_id)
         
-        subject = 'Welcome to Django Internship API!'
-        
-        # Create both plain text and HTML versions
-        text_message = f"""
-        Hello {user.username}!
-        
-        Welcome to our Django Internship API platform. Your account has been successfully created.
-        
-        Here's what you can do now:
-        - Access protected endpoints using your authentication token
-        - View your profile at /api/profile/
-        - Explore the API documentation
-        
-        Account Details:
-        - Username: {user.username}
-        - Email: {user.email}
-        - Registration Date: {user.date_joined.strftime('%Y-%m-%d %H:%M:%S')}
-        
-        Best regards,
-        Django Internship Team
-        """
-        
-        html_message = f"""
-        <html>
-        <body>
-            <h2>Welcome to Django Internship API!</h2>
-            <p>Hello <strong>{user.username}</strong>!</p>
-            
-            <p>Welcome to our Django Internship API platform. Your account has been successfully created.</p>
-            
-            <h3>What you can do now:</h3>
-            <ul>
-                <li>Access protected endpoints using your authentication token</li>
-                <li>View your profile at <code>/api/profile/</code></li>
-                <li>Explore the API documentation</li>
-            </ul>
-            
-            <h3>Account Details:</h3>
-            <ul>
-                <li><strong>Username:</strong> {user.username}</li>
-                <li><strong>Email:</strong> {user.email}</li>
-                <li><strong>Registration Date:</strong> {user.date_joined.strftime('%Y-%m-%d %H:%M:%S')}</li>
-            </ul>
-            
-            <p>Best regards,<br>Django Internship Team</p>
-        </body>
-        </html>
-        """
+        if not user.email:
+            logger.info(f"User {user.username} has no email address, welcome email skipped")
+            return f"Welcome email skipped for {user.username}"
         
         # Send email with both text and HTML versions
         if settings.EMAIL_HOST_USER:
-            email = EmailMultiAlternatives(
-                subject=subject,
-                body=text_message,
-                from_email=settings.EMAIL_HOST_USER,
-                to=[user.email]
-            )
-            email.attach_alternative(html_message, "text/html")
-            email.send()
+            delivery = send_once(f"{idempotency_key}:{user.pk}", [build_welcome_email(user)])
+            if delivery['failed']:
+                raise Exception(f"Failed to send welcome email to {user.email}")
             logger.info(f"Welcome email sent to {user.email}")
         else:
             logger.info(f"Email not configured, but welcome email task completed for user {user.username}")
@@ -96,41 +130,113 @@ def send_welcome_email(user_id):
 
 
 @shared_task
-def cleanup_old_logs():
+def send_welcome_emails(user_ids, idempotency_key='welcome'):
+    """
+    Send welcome emails to a batch of new users, e.g. after a bulk
+    registration. Users are loaded in one query and the emails are sent in
+    batches over one mail server connection, skipping users already
+    welcomed under ``<idempotency_key>:<user id>``.
     """
-    Clean up old API logs (older than 30 days).
+    try:
+        users = list(User.objects.filter(id__in=user_ids).exclude(email=''))
+        
+        if not settings.EMAIL_HOST_USER:
+            logger.info(f"Email not configured, but welcome email task completed for {len(users)} users")
+            return f"Welcome emails skipped for {len(users)} users"
+        
+        delivery = send_each_once([(f"{idempotency_key}:{user.pk}", build_welcome_email(user)) for user in users])
+        sent = len(delivery['sent'])
+        logger.info(f"Welcome emails sent to {sent} of {len(user_ids)} users")
+        return f"Welcome emails sent to {sent} users"
+        
+    except Exception as e:
+        logger.error(f"Error sending welcome emails: {str(e)}")
+        raise
+
+
+@shared_task(bind=True)
+def cleanup_old_logs(self, retention_days=None, batch_size=None, pause=None):
+    """
+    Clean up old API logs (older than API_LOG_RETENTION_DAYS, 30 by default).
     This task can be scheduled to run periodically.
+    
+    Rows are deleted in primary-key ranges of ``batch_size`` with ``pause``
+    seconds between batches, so each DELETE is short and concurrent log
+    writes are never blocked for long.
     """
     from datetime import timedelta
     from django.utils import timezone
     from .models import ApiLog
     
+    retention_days = settings.API_LOG_RETENTION_DAYS if retention_days is None else retention_days
+    batch_size = batch_size or settings.API_LOG_DELETE_BATCH_SIZE
+    pause = settings.API_LOG_DELETE_PAUSE if pause is None else pause
+    
     try:
-        cutoff_date = timezone.now() - timedelta(days=30)
-        deleted_count = ApiLog.objects.filter(timestamp__lt=cutoff_date).delete()[0]
-        logger.info(f"Cleaned up {deleted_count} old API logs")
+        cutoff_date = timezone.now() - timedelta(days=retention_days)
+        old_logs = ApiLog.objects.filter(timestamp__lt=cutoff_date)
+        
+        deleted_count = 0
+        batches = 0
+        if partitioning.is_partitioned():
+            # Whole expired partitions go with a constant-time DROP; the
+            # batched delete below only trims the partition holding the cutoff
+            deleted_count += partitioning.drop_expired_partitions(cutoff_date)
+        
+        # Every expired row lies between the table's first id and the highest
+        # expired id; only that range is walked.
+        first_id = ApiLog.objects.order_by('id').values_list('id', flat=True).first()
+        last_id = old_logs.aggregate(last_id=Max('id'))['last_id']
+        
+        if last_id is not None:
+            for low_id in range(first_id, last_id + 1, batch_size):
+                # ApiLog has no dependent rows or delete signals, so this is a
+                # single DELETE without collecting objects in memory
+                deleted_count += old_logs.filter(
+                    id__gte=low_id, id__lt=low_id + batch_size
+                ).delete()[0]
+                batches += 1
+                
+                progress = {
+                    'deleted': deleted_count,
+                    'batches': batches,
+                    'current_id': low_id + batch_size,
+                    'last_id': last_id,
+                }
+                if self.request.id:
+                    self.update_state(state='PROGRESS', meta=progress)
+                if batches % 100 == 0:
+                    logger.info(f"Log cleanup progress: {progress}")
+                if pause:
+                    time.sleep(pause)
+        
+        logger.info(f"Cleaned up {deleted_count} old API logs in {batches} batches")
+        
+        # Hour rollups are kept; minute rollups only serve the edges of recent windows
+        minute_cutoff = timezone.now() - timedelta(days=settings.API_ROLLUP_MINUTE_RETENTION_DAYS)
+        pruned_count = prune_minute_rollups(minute_cutoff)
+        logger.info(f"Pruned {pruned_count} minute rollups")
         return f"Cleaned up {deleted_count} old API logs"
     except Exception as e:
         logger.error(f"Error cleaning up logs: {str(e)}")
         raise
 
 
-@shared_task
-def send_notification_email(user_id, subject, message):
+@shared_task(bind=True)
+def send_notification_email(self, user_id, subject, message, idempotency_key=None):
     """
     Generic task to send notification emails.
+    The idempotency key defaults to one for this task invocation; pass a
+    derive_message_key key to send the same content only once.
     """
     try:
         user = User.objects.get(id=user_id)
         
         if settings.EMAIL_HOST_USER and user.email:
-            send_mail(
-                subject=subject,
-                message=message,
-                from_email=settings.EMAIL_HOST_USER,
-                recipient_list=[user.email],
-                fail_silently=False,
-            )
+            key = idempotency_key or invocation_key('notification', self.request.id)
+            email = EmailMessage(subject=subject, body=message, from_email=settings.EMAIL_HOST_USER, to=[user.email])
+            if send_once(key, [email])['failed']:
+                raise Exception(f"Failed to send notification email to {user.email}")
             logger.info(f"Notification email sent to {user.email}")
             return f"Notification email sent to {user.email}"
         else:
@@ -145,10 +251,11 @@ def send_notification_email(user_id, subject, message):
         raise
 
 
-@shared_task
-def send_password_reset_email(user_id, reset_link):
+@shared_task(bind=True)
+def send_password_reset_email(self, user_id, reset_link, idempotency_key=None):
     """
     Send password reset email to user.
+    The idempotency key defaults to one for this task invocation.
     """
     try:
         user = User.objects.get(id=user_id)
@@ -169,13 +276,10 @@ def send_password_reset_email(user_id, reset_link):
         """
         
         if settings.EMAIL_HOST_USER and user.email:
-            send_mail(
-                subject=subject,
-                message=message,
-                from_email=settings.EMAIL_HOST_USER,
-                recipient_list=[user.email],
-                fail_silently=False,
-            )
+            key = idempotency_key or invocation_key('password_reset', self.request.id)
+            email = EmailMessage(subject=subject, body=message, from_email=settings.EMAIL_HOST_USER, to=[user.email])
+            if send_once(key, [email])['failed']:
+                raise Exception(f"Failed to send password reset email to {user.email}")
             logger.info(f"Password reset email sent to {user.email}")
             return f"Password reset email sent to {user.email}"
         else:
@@ -210,23 +314,47 @@ def generate_daily_report():
         
         logs = ApiLog.objects.filter(timestamp__range=[today_start, today_end])
         
-        # Generate report data
-        total_requests = logs.count()
-        successful_requests = logs.filter(response_status__lt=400).count()
-        failed_requests = logs.filter(response_status__gte=400).count()
-        unique_users = logs.filter(user__isnull=False).values('user').distinct().count()
-        unique_ips = logs.values('ip_address').distinct().count()
-        
-        # Most accessed endpoints
-        endpoint_stats = {}
-        for log in logs:
-            endpoint = log.endpoint
-            endpoint_stats[endpoint] = endpoint_stats.get(endpoint, 0) + 1
-        
-        # Average response time
-        avg_response_time = logs.aggregate(
-            avg_time=timezone.models.Avg('response_time')
-        )['avg_time'] or 0
+        if use_rollups():
+            # Every figure comes from the pre-aggregated rollups
+            refresh_rollups()
+            day_end = today_start + timedelta(days=1)
+            distinct = summarize_client_rollups(client_rollups_between(today_start, day_end))
+            unique_users = distinct['unique_users']
+            unique_ips = distinct['unique_ips']
+            
+            rollups = rollups_between(today_start, day_end)
+            summary = summarize_rollups(rollups)
+            total_requests = summary['total_requests']
+            failed_requests = summary['error_requests']
+            successful_requests = total_requests - failed_requests
+            avg_response_time = summary['avg_response_time']
+            endpoint_stats = {
+                row['endpoint']: row['requests'] for row in endpoint_rollups(rollups)[:5]
+            }
+            sketches = rollup_latency_sketches(rollups.filter(endpoint__in=list(endpoint_stats)))
+        else:
+            # All totals in one aggregate query over the day's rows
+            totals = logs.aggregate(
+                total_requests=Count('id'),
+                successful_requests=Count('id', filter=Q(response_status__lt=400)),
+                failed_requests=Count('id', filter=Q(response_status__gte=400)),
+                unique_users=Count('user', distinct=True),
+                unique_ips=Count('ip_address', distinct=True),
+                avg_response_time=Avg('response_time'),
+            )
+            total_requests = totals['total_requests']
+            successful_requests = totals['successful_requests']
+            failed_requests = totals['failed_requests']
+            unique_users = totals['unique_users']
+            unique_ips = totals['unique_ips']
+            avg_response_time = totals['avg_response_time'] or 0
+            
+            # Most accessed endpoints, grouped in SQL
+            endpoint_stats = {
+                row['endpoint']: row['requests']
+                for row in logs.values('endpoint').annotate(requests=Count('id')).order_by('-requests')[:5]
+            }
+            sketches = latency_sketches(logs.filter(endpoint__in=list(endpoint_stats)))
         
         report = {
             'date': today.isoformat(),
@@ -237,7 +365,11 @@ def generate_daily_report():
             'unique_users': unique_users,
             'unique_ips': unique_ips,
             'avg_response_time': f"{avg_response_time:.3f}s",
-            'top_endpoints': dict(sorted(endpoint_stats.items(), key=lambda x: x[1], reverse=True)[:5])
+            'top_endpoints': dict(sorted(endpoint_stats.items(), key=lambda x: x[1], reverse=True)[:5]),
+            'latency_percentiles': {
+                endpoint: {name: f"{value:.3f}s" for name, value in sketches[endpoint].percentiles().items()}
+                for endpoint in endpoint_stats if endpoint in sketches
+            }
         }
         
         logger.info(f"Daily report generated: {report}")
@@ -289,50 +421,48 @@ def process_api_analytics():
     try:
         from .models import ApiLog
         
-        # Simulate heavy analytics processing
-        time.sleep(2)  # Simulate processing time
-        
         # Get last 7 days of data
-        week_ago = timezone.now() - timedelta(days=7)
+        now = timezone.now()
+        week_ago = now - timedelta(days=7)
         logs = ApiLog.objects.filter(timestamp__gte=week_ago)
         
-        analytics = {
-            'total_requests': logs.count(),
-            'unique_users': logs.filter(user__isnull=False).values('user').distinct().count(),
-            'avg_response_time': logs.aggregate(avg_time=timezone.models.Avg('response_time'))['avg_time'] or 0,
-            'error_rate': logs.filter(response_status__gte=400).count() / logs.count() * 100 if logs.count() > 0 else 0,
-            'most_active_user': None,
-            'slowest_endpoint': None
-        }
+        if use_rollups():
+            analytics = rollup_api_analytics(week_ago, now)
+            logger.info(f"Analytics processed: {analytics}")
+            return analytics
         
-        # Find most active user
-        if logs.filter(user__isnull=False).exists():
-            user_activity = {}
-            for log in logs.filter(user__isnull=False):
-                user_id = log.user.id
-                user_activity[user_id] = user_activity.get(user_id, 0) + 1
-            
-            most_active_user_id = max(user_activity, key=user_activity.get)
-            most_active_user = User.objects.get(id=most_active_user_id)
-            analytics['most_active_user'] = {
-                'username': most_active_user.username,
-                'request_count': user_activity[most_active_user_id]
+        # Every total in one aggregate query; nothing is loaded into Python
+        totals = logs.aggregate(
+            total_requests=Count('id'),
+            error_requests=Count('id', filter=Q(response_status__gte=400)),
+            unique_users=Count('user', distinct=True),
+            avg_response_time=Avg('response_time'),
+        )
+        total_requests = totals['total_requests']
+        
+        analytics = {
+            'total_requests': total_requests,
+            'unique_users': totals['unique_users'],
+            'avg_response_time': totals['avg_response_time'] or 0,
+            'error_rate': totals['error_requests'] / total_requests * 100 if total_requests > 0 else 0,
+            'most_active_user': get_most_active_user(logs),
+            'slowest_endpoint': None,
+            'latency_percentiles': {
+                endpoint: sketch.percentiles() for endpoint, sketch in latency_sketches(logs).items()
             }
+        }
         
         # Find slowest endpoint
-        endpoint_times = {}
-        for log in logs:
-            endpoint = log.endpoint
-            if endpoint not in endpoint_times:
-                endpoint_times[endpoint] = []
-            endpoint_times[endpoint].append(log.response_time)
-        
-        if endpoint_times:
-            avg_times = {endpoint: sum(times)/len(times) for endpoint, times in endpoint_times.items()}
-            slowest_endpoint = max(avg_times, key=avg_times.get)
+        slowest_endpoint = (
+            logs.values('endpoint')
+            .annotate(avg_time=Avg('response_time'))
+            .order_by('-avg_time')
+            .first()
+        )
+        if slowest_endpoint:
             analytics['slowest_endpoint'] = {
-                'endpoint': slowest_endpoint,
-                'avg_time': avg_times[slowest_endpoint]
+                'endpoint': slowest_endpoint['endpoint'],
+                'avg_time': slowest_endpoint['avg_time']
             }
         
         logger.info(f"Analytics processed: {analytics}")
@@ -343,52 +473,186 @@ def process_api_analytics():
         raise
 
 
-@shared_task(bind=True, max_retries=3)
-def send_bulk_notifications(self, user_ids, subject, message):
+def get_most_active_user(logs):
+    """Username and request count of the busiest user in ``logs``, grouped in SQL."""
+    most_active_user = (
+        logs.filter(user__isnull=False)
+        .values('user__username')
+        .annotate(request_count=Count('id'))
+        .order_by('-request_count')
+        .first()
+    )
+    if not most_active_user:
+        return None
+    return {
+        'username': most_active_user['user__username'],
+        'request_count': most_active_user['request_count']
+    }
+
+
+def rollup_api_analytics(start, end):
+    """
+    Analytics for ``start <= t < end`` read from the rollups; per-user
+    figures come from the client rollups.
+    """
+    refresh_rollups()
+    rollups = rollups_between(start, end)
+    client_rollups = client_rollups_between(start, end)
+    summary = summarize_rollups(rollups)
+    total_requests = summary['total_requests']
+    
+    analytics = {
+        'total_requests': total_requests,
+        'unique_users': summarize_client_rollups(client_rollups)['unique_users'],
+        'avg_response_time': summary['avg_response_time'],
+        'error_rate': summary['error_requests'] / total_requests * 100 if total_requests > 0 else 0,
+        'most_active_user': None,
+        'slowest_endpoint': None,
+        'latency_percentiles': {
+            endpoint: sketch.percentiles() for endpoint, sketch in rollup_latency_sketches(rollups).items()
+        }
+    }
+    
+    analytics['most_active_user'] = most_active_user(client_rollups)
+    
+    slowest_endpoint = endpoint_rollups(rollups).order_by('-avg_time').first()
+    if slowest_endpoint:
+        analytics['slowest_endpoint'] = {
+            'endpoint': slowest_endpoint['endpoint'],
+            'avg_time': slowest_endpoint['avg_time']
+        }
+    
+    return analytics
+
+
+@shared_task
+def maintain_api_log_partitions():
+    """
+    Create upcoming API log partitions ahead of time.
+    No-op unless the log table has been partitioned on PostgreSQL.
+    """
+    try:
+        created = partitioning.ensure_partitions()
+        return f"Created {len(created)} API log partitions"
+    except Exception as e:
+        logger.error(f"Error maintaining API log partitions: {str(e)}")
+        raise
+
+
+@shared_task
+def refresh_api_log_rollups():
+    """
+    Fold new API logs into the minute/hour rollups.
+    Scheduled every minute so report tasks only have a small tail to catch up.
+    """
+    try:
+        processed = refresh_rollups()
+        if processed:
+            cache.invalidate('api_analytics')
+        return f"Rolled up {processed} API logs"
+    except Exception as e:
+        logger.error(f"Error refreshing API log rollups: {str(e)}")
+        raise
+
+
+@shared_task(bind=True)
+def send_bulk_notifications(self, user_ids, subject, message, idempotency_key=None):
     """
     Send bulk notifications to multiple users.
-    Includes retry logic for failed sends.
+    Recipients are split into chunks of EMAIL_FANOUT_CHUNK_SIZE users that
+    send_notification_chunk tasks deliver in parallel across workers. This
+    task is replaced by a chord, so its result is the combined summary from
+    summarize_bulk_notifications. Users who already received the
+    notification under ``idempotency_key`` are skipped; it defaults to one
+    for this task, shared by all of its chunks and their retries.
+    """
+    chunk_size = getattr(settings, 'EMAIL_FANOUT_CHUNK_SIZE', 500)
+    chunks = [user_ids[i:i + chunk_size] for i in range(0, len(user_ids), chunk_size)]
+    if not chunks:
+        return summarize_bulk_notifications([])
+    
+    logger.info(f"Bulk notification to {len(user_ids)} users split into {len(chunks)} chunks")
+    key = idempotency_key or invocation_key('notification', self.request.id)
+    header = group(send_notification_chunk.s(chunk, subject, message, idempotency_key=key) for chunk in chunks)
+    return self.replace(chord(header, summarize_bulk_notifications.s()))
+
+
+@shared_task(bind=True, max_retries=3)
+def send_notification_chunk(self, user_ids, subject, message, idempotency_key=None,
+                            sent_before=0, skipped_before=(), already_sent_before=0):
+    """
+    Send one chunk of a bulk notification over one mail connection.
+    Recipients the delivery ledger has as sent under ``idempotency_key`` are
+    skipped and counted separately from the ones sent now, and a retry only
+    covers the recipients whose email failed, so nobody gets the notification
+    twice. When retries run out the failures are reported, not raised, so the
+    rest of the bulk send still completes.
     """
     try:
-        users = User.objects.filter(id__in=user_ids, email__isnull=False)
-        
-        sent_count = 0
-        failed_emails = []
-        
-        for user in users:
-            try:
-                if user.email and settings.EMAIL_HOST_USER:
-                    send_mail(
-                        subject=subject,
-                        message=f"Hello {user.username},\n\n{message}",
-                        from_email=settings.EMAIL_HOST_USER,
-                        recipient_list=[user.email],
-                        fail_silently=False,
-                    )
-                    sent_count += 1
-                    logger.info(f"Bulk notification sent to {user.email}")
-                else:
-                    failed_emails.append(user.email or f"user_{user.id}")
-                    
-            except Exception as e:
-                logger.error(f"Failed to send email to {user.email}: {str(e)}")
-                failed_emails.append(user.email or f"user_{user.id}")
-        
-        result = {
-            'sent_count': sent_count,
-            'failed_count': len(failed_emails),
-            'failed_emails': failed_emails
-        }
-        
-        if failed_emails and self.request.retries < self.max_retries:
-            logger.warning(f"Retrying bulk notification for {len(failed_emails)} failed emails")
-            raise self.retry(countdown=60, exc=Exception(f"Failed to send to {len(failed_emails)} emails"))
-        
-        logger.info(f"Bulk notification completed: {result}")
-        return result
-        
+        skipped_emails = list(skipped_before)
+        emails = {}
+        for user in User.objects.filter(id__in=user_ids):
+            if user.email and settings.EMAIL_HOST_USER:
+                emails[user.id] = EmailMessage(
+                    subject=subject,
+                    body=f"Hello {user.username},\n\n{message}",
+                    from_email=settings.EMAIL_HOST_USER,
+                    to=[user.email],
+                )
+            else:
+                # Retrying cannot help these users
+                skipped_emails.append(user.email or f"user_{user.id}")
+        
+        key = idempotency_key or invocation_key('notification', self.request.id)
+        delivery = send_once(key, list(emails.values()))
     except Exception as e:
-        logger.error(f"Error in bulk notification task: {str(e)}")
+        logger.error(f"Error in bulk notification chunk: {str(e)}")
         if self.request.retries < self.max_retries:
             raise self.retry(countdown=60)
         raise
+    
+    failed = {id(email) for email in delivery['failed']}
+    failed_ids = [user_id for user_id, email in emails.items() if id(email) in failed]
+    sent_count = sent_before + len(delivery['sent'])
+    already_sent_count = already_sent_before + len(delivery['skipped'])
+    
+    if failed_ids and self.request.retries < self.max_retries:
+        logger.warning(f"Retrying bulk notification for {len(failed_ids)} failed emails")
+        raise self.retry(
+            args=[failed_ids, subject, message],
+            kwargs={
+                'idempotency_key': key,
+                'sent_before': sent_count,
+                'skipped_before': skipped_emails,
+                'already_sent_before': already_sent_count,
+            },
+            countdown=60,
+        )
+    
+    failed_emails = [emails[user_id].to[0] for user_id in failed_ids] + skipped_emails
+    return {
+        'sent_count': sent_count,
+        'skipped_count': already_sent_count,
+        'failed_count': len(failed_emails),
+        'failed_emails': failed_emails,
+        'batches': delivery['batches'],
+    }
+
+
+@shared_task
+def summarize_bulk_notifications(results):
+    """
+    Chord callback of send_bulk_notifications: add up the chunk results.
+    """
+    summary = {
+        'chunks': len(results),
+        'sent_count': sum(result['sent_count'] for result in results),
+        'skipped_count': sum(result['skipped_count'] for result in results),
+        'failed_count': sum(result['failed_count'] for result in results),
+        'failed_emails': [email for result in results for email in result['failed_emails']],
+    }
+    logger.info(
+        f"Bulk notification completed: {summary['sent_count']} sent, {summary['skipped_count']} already sent, "
+        f"{summary['failed_count']} failed in {summary['chunks']} chunks"
+    )
+    return summary
@@ -1,3 +1,1114 @@
-from django.test import TestCase
+import random
+import threading
+import time
+from datetime import timedelta
+from importlib.util import find_spec
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+from django.contrib.auth.models import Group, Permission, User
+from django.core import mail
+from django.core.cache import cache as django_cache
+from django.core.mail import EmailMessage
+from django.core.mail.backends.locmem import EmailBackend as LocmemEmailBackend
+from django.core.signals import request_finished, request_started
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from celery.backends.cache import CacheBackend
+from celery.exceptions import Retry
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from django_internship import cache as cache_utils
+from django_internship import celery_app
+
+from . import hashers
+from .admin import ApiLogUserFilter
+from .authentication import CACHED_USER_FIELDS, TOKEN_CACHE_NAMESPACE, CachedTokenAuthentication, token_cache_key
+from .batching import BackgroundBatcher
+from .caching import response_cache_key
+from .deliveries import derive_message_key, send_once
+from .mail import send_batched
+from .models import ApiLog, ApiLogClientRollup, ApiLogRollup, EmailDelivery, RollupWatermark, UserProfile
+from .outbox import enqueue
+from .pagination import EstimatedCountPaginator
+from .permission_cache import get_all_permissions
+from .rollups import ROLLUP_FIELDS, latency_sketches, refresh_rollups, rollups_between, summarize_rollups
+from .serializers import ApiLogSerializer, ApiLogValuesSerializer, BulkUserRegistrationSerializer
+from .sketches import DEFAULT_RELATIVE_ACCURACY, DDSketch
+from .tasks import (
+    cleanup_old_logs,
+    generate_daily_report,
+    process_api_analytics,
+    send_bulk_notifications,
+    send_notification_chunk,
+    send_notification_email,
+    send_welcome_email,
+    send_welcome_emails,
+    summarize_bulk_notifications,
+)
+from .tokens import get_token
+
+# Cache-dependent tests must not share state through a Redis CACHE_BACKEND
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(API_LOG_SINK='api.log_writer.DirectApiLogSink', CACHES=LOCMEM_CACHES)
+class ApiLogListViewTests(TestCase):
+    """Query counts and output of the /api/logs/ listing."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'admin12345')
+        users = [User.objects.create_user(f'user{i}', password='password123') for i in range(5)]
+        now = timezone.now()
+        ApiLog.objects.bulk_create([
+            ApiLog(
+                endpoint=f'/api/endpoint{i % 3}/',
+                method='GET',
+                user=users[i % 5] if i % 4 else None,
+                ip_address='127.0.0.1',
+                timestamp=now - timedelta(seconds=i),
+                response_status=200,
+                response_time=0.05,
+            )
+            for i in range(120)
+        ])
+
+    def setUp(self):
+        django_cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_query_count_constant_as_page_size_grows(self):
+        # One SELECT for the page plus the INSERT logging this request
+        for page_size in (5, 50, 200):
+            expected_rows = min(page_size, ApiLog.objects.count())
+            with self.subTest(page_size=page_size), self.assertNumQueries(2):
+                response = self.client.get('/api/logs/', {'page_size': page_size})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['results']), expected_rows)
+
+    def test_values_serializer_matches_model_serializer(self):
+        queryset = ApiLog.objects.order_by('-timestamp', '-id')
+        expected = ApiLogSerializer(queryset.select_related('user'), many=True).data
+        actual = ApiLogValuesSerializer(ApiLogValuesSerializer.get_values(queryset), many=True).data
+        self.assertEqual(actual, expected)
+
+
+@override_settings(API_LOG_SINK='api.log_writer.DirectApiLogSink', CACHES=LOCMEM_CACHES)
+class ApiLogCursorWalkTests(TestCase):
+    """Following next/previous links visits every log once, ties included."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'admin12345')
+        now = timezone.now()
+        # Groups of four logs share a timestamp, so pages split ties on id
+        ApiLog.objects.bulk_create([
+            ApiLog(
+                endpoint='/api/public/', method='GET', ip_address='127.0.0.1',
+                timestamp=now - timedelta(minutes=10, seconds=i // 4),
+                response_status=200, response_time=0.01,
+            )
+            for i in range(37)
+        ])
+        cls.expected = list(ApiLog.objects.order_by('-timestamp', '-id').values_list('id', flat=True))
+
+    def setUp(self):
+        django_cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def walk(self, url, link):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([row['id'] for row in response.data['results']])
+            url = response.data[link]
+        return pages
+
+    def test_forward_and_backward_walks_cover_every_log_once(self):
+        # Filtered to the seeded logs: the walk's own requests add new ones
+        forward = self.walk('/api/logs/?page_size=5&endpoint=/api/public/', 'next')
+        self.assertEqual([len(page) for page in forward], [5] * 7 + [2])
+        self.assertEqual([pk for page in forward for pk in page], self.expected)
+
+        last_page = self.client.get('/api/logs/?page_size=5&endpoint=/api/public/')
+        for _ in range(7):
+            last_page = self.client.get(last_page.data['next'])
+        backward = self.walk(last_page.data['previous'], 'previous')
+        self.assertEqual([pk for page in reversed(backward) for pk in page], self.expected[:-2])
+
+
+@override_settings(API_LOG_SINK='api.log_writer.DirectApiLogSink', CACHES=LOCMEM_CACHES)
+class ApiLogLatencyViewTests(TestCase):
+    """Latency percentiles from the rollup sketches."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'admin12345')
+        ApiLog.objects.bulk_create([
+            ApiLog(
+                endpoint='/api/public/', method='GET', ip_address='127.0.0.1',
+                timestamp=timezone.now() - timedelta(hours=1), response_status=200, response_time=0.01 * (i + 1),
+            )
+            for i in range(100)
+        ])
+        refresh_rollups()
+
+    def setUp(self):
+        django_cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_percentiles_from_rollups(self):
+        response = self.client.get('/api/logs/latency/', {'hours': 2})
+        self.assertEqual(response.status_code, 200)
+        [endpoint] = response.data['endpoints']
+        self.assertEqual(endpoint['requests'], 100)
+        self.assertAlmostEqual(endpoint['p50'], 0.5, delta=0.5 * DEFAULT_RELATIVE_ACCURACY)
+
+    def test_hours_out_of_range_is_a_400(self):
+        for hours in ('0', '-5', '2161', '1000000000', 'week'):
+            with self.subTest(hours=hours):
+                self.assertEqual(self.client.get('/api/logs/latency/', {'hours': hours}).status_code, 400)
+
+
+@override_settings(API_LOG_SINK='api.log_writer.DirectApiLogSink', CACHES=LOCMEM_CACHES)
+class ApiLogMiddlewareTests(TestCase):
+    """Every /api/ request gets exactly one ApiLog row."""
+
+    def setUp(self):
+        django_cache.clear()
+        self.client = APIClient()
+
+    def logged(self):
+        return list(ApiLog.objects.order_by('id').values_list('endpoint', 'method', 'response_status'))
+
+    def test_function_based_views_are_logged(self):
+        User.objects.create_user('jack', 'jack@example.com', 'password123')
+        self.client.get('/api/public/')
+        self.client.post('/api/login/', {'username': 'jack', 'password': 'password123'}, format='json')
+        self.client.post('/api/register/', {
+            'username': 'kate', 'email': 'kate@example.com',
+            'password': 'password123', 'password_confirm': 'password123',
+        }, format='json')
+        self.assertEqual(self.logged(), [
+            ('/api/public/', 'GET', 200),
+            ('/api/login/', 'POST', 200),
+            ('/api/register/', 'POST', 201),
+        ])
+
+    def test_logged_user_is_the_authenticated_one(self):
+        user = User.objects.create_user('jack', 'jack@example.com', 'password123')
+        self.client.force_authenticate(user)
+        self.client.get('/api/protected/')
+        self.assertEqual(ApiLog.objects.get().user_id, user.pk)
+
+    def test_mixin_views_are_logged_once(self):
+        user = User.objects.create_user('jack', 'jack@example.com', 'password123')
+        self.client.force_authenticate(user)
+        self.assertEqual(self.client.get('/api/profile/').status_code, 200)
+        self.assertEqual(self.logged(), [('/api/profile/', 'GET', 200)])
+
+    def test_paths_outside_api_are_skipped(self):
+        self.client.get('/')
+        self.client.get('/admin/login/')
+        self.assertFalse(ApiLog.objects.exists())
+
+    def test_sink_errors_do_not_break_the_response(self):
+        with mock.patch('api.middleware.get_log_sink', side_effect=RuntimeError('down')):
+            self.assertEqual(self.client.get('/api/public/').status_code, 200)
+
+
+@override_settings(API_LOG_SINK='api.log_writer.DirectApiLogSink', CACHES=LOCMEM_CACHES, API_RESPONSE_CACHE_TIMEOUT=30)
+class ResponseCacheTests(TestCase):
+    """Caching of /api/public/: validators, freshness and what is never cached."""
+
+    def setUp(self):
+        django_cache.clear()
+        self.client = APIClient()
+
+    def test_repeat_serves_same_etag_with_max_age(self):
+        first = self.client.get('/api/public/', HTTP_ACCEPT='application/json')
+        second = self.client.get('/api/public/', HTTP_ACCEPT='application/json')
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first['ETag'])
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second.content, first.content)
+        self.assertIn('public', second['Cache-Control'])
+        max_age = int(second['Cache-Control'].split('max-age=')[1].split(',')[0])
+        self.assertTrue(0 < max_age <= 30)
+
+    def test_matching_if_none_match_is_a_304(self):
+        etag = self.client.get('/api/public/', HTTP_ACCEPT='application/json')['ETag']
+        response = self.client.get('/api/public/', HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        stale = self.client.get('/api/public/', HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(stale.status_code, 200)
+
+    def test_browsable_api_html_is_not_cached(self):
+        response = self.client.get('/api/public/', HTTP_ACCEPT='text/html')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+        self.assertIsNone(cache_utils.get('response', response_cache_key('public_endpoint', response.wsgi_request)))
+
+    def test_logged_in_request_bypasses_cache(self):
+        user = User.objects.create_user('ivy', 'ivy@example.com', 'password123')
+        self.client.force_login(user)
+        response = self.client.get('/api/public/', HTTP_ACCEPT='text/html')
+        self.assertContains(response, 'ivy')
+        self.assertNotIn('ETag', response)
+        self.client.logout()
+        anonymous = self.client.get('/api/public/', HTTP_ACCEPT='text/html')
+        self.assertNotContains(anonymous, 'ivy')
+
+
+@override_settings(API_LOG_SINK='api.log_writer.DirectApiLogSink', CACHES=LOCMEM_CACHES)
+class UserProfileViewTests(TestCase):
+    """Profile creation, query counts and caching of /api/profile/."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', 'alice@example.com', 'password123')
+
+    def setUp(self):
+        django_cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_profile_created_with_user(self):
+        self.assertTrue(UserProfile.objects.filter(user=self.user).exists())
+
+    def test_get_is_one_query(self):
+        # One joined SELECT for profile and user plus the INSERT logging this request
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/profile/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['user']['username'], 'alice')
+
+    @override_settings(API_PROFILE_CACHE_TIMEOUT=60)
+    def test_cached_get_skips_database_until_update(self):
+        self.client.get('/api/profile/')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/profile/')
+        self.assertIsNone(response.data['bio'])
+
+        self.client.patch('/api/profile/', {'bio': 'Hello'}, format='json')
+        response = self.client.get('/api/profile/')
+        self.assertEqual(response.data['bio'], 'Hello')
+
+    def test_conditional_get_returns_304_until_changed(self):
+        etag = self.client.get('/api/profile/')['ETag']
+        response = self.client.get('/api/profile/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.client.patch('/api/profile/', {'bio': 'Changed'}, format='json')
+        response = self.client.get('/api/profile/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_if_match_rejects_stale_update(self):
+        etag = self.client.get('/api/profile/')['ETag']
+        response = self.client.patch('/api/profile/', {'bio': 'First'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.patch('/api/profile/', {'bio': 'Second'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(UserProfile.objects.get(user=self.user).bio, 'First')
+
+    def test_sparse_fieldset(self):
+        response = self.client.get('/api/profile/', {'fields': 'bio,updated_at'})
+        self.assertEqual(set(response.data), {'bio', 'updated_at'})
+        self.assertEqual(self.client.get('/api/profile/', {'fields': 'password'}).status_code, 400)
+
+
+@override_settings(API_LOG_SINK='api.log_writer.DirectApiLogSink', CACHES=LOCMEM_CACHES)
+@mock.patch('api.registration.send_welcome_emails')
+class BulkRegistrationTests(TestCase):
+    """Validation and batched inserts of /api/register/bulk/."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'admin12345')
+
+    def setUp(self):
+        django_cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def entries(self, *usernames):
+        return [
+            {'username': name, 'email': f'{name}@example.com', 'password': 'password123', 'password_confirm': 'password123'}
+            for name in usernames
+        ]
+
+    def test_creates_users_profiles_and_tokens(self, send_welcome_emails):
+        response = self.client.post('/api/register/bulk/', {'users': self.entries('bob', 'carol')}, format='json')
+        self.assertEqual(response.status_code, 201)
+        users = User.objects.filter(username__in=['bob', 'carol'])
+        self.assertEqual(UserProfile.objects.filter(user__in=users).count(), 2)
+        self.assertEqual(
+            set(Token.objects.filter(user__in=users).values_list('key', flat=True)),
+            {entry['token'] for entry in response.data['users']},
+        )
+        self.assertTrue(users.get(username='bob').check_password('password123'))
+        send_welcome_emails.s.assert_called_once_with(sorted(users.values_list('id', flat=True)))
+
+    def test_query_count_does_not_grow_with_batch(self, send_welcome_emails):
+        # Uniqueness check, savepoint, user/profile/token INSERTs, release and the request log
+        with self.assertNumQueries(7):
+            self.client.post('/api/register/bulk/', {'users': self.entries(*[f'u{i}' for i in range(20)])}, format='json')
+        self.assertEqual(User.objects.filter(username__startswith='u').count(), 20)
+
+    def test_rejects_whole_batch_on_conflict(self, send_welcome_emails):
+        response = self.client.post('/api/register/bulk/', {'users': self.entries('dave', 'dave')}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/register/bulk/', {'users': self.entries('erin', 'admin')}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(User.objects.filter(username__in=['dave', 'erin']).exists())
+        send_welcome_emails.s.assert_not_called()
+
+    def test_username_taken_after_validation_is_a_400(self, send_welcome_emails):
+        # Simulate a concurrent request registering 'admin' between validation and insert
+        with mock.patch.object(BulkUserRegistrationSerializer, 'validate_users', side_effect=lambda users: users):
+            response = self.client.post('/api/register/bulk/', {'users': self.entries('fay', 'admin')}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'users': ['Usernames already taken: admin']})
+        self.assertFalse(User.objects.filter(username='fay').exists())
+
+
+@override_settings(API_LOG_SINK='api.log_writer.DirectApiLogSink', CACHES=LOCMEM_CACHES)
+@mock.patch('api.outbox.get_task_publisher')
+class TaskOutboxTests(TestCase):
+    """Tasks queued with api.outbox.enqueue() are only published on commit."""
+
+    def setUp(self):
+        django_cache.clear()
+
+    def test_registration_publishes_welcome_email_after_commit(self, get_task_publisher):
+        data = {'username': 'frank', 'email': 'frank@example.com', 'password': 'password123', 'password_confirm': 'password123'}
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post('/api/register/', data, format='json')
+            self.assertEqual(response.status_code, 201)
+            get_task_publisher.return_value.publish.assert_not_called()
+        for callback in callbacks:
+            callback()
+
+        signature = get_task_publisher.return_value.publish.call_args.args[0]
+        self.assertEqual(signature.task, 'api.tasks.send_welcome_email')
+        self.assertEqual(signature.args, (response.data['user_id'],))
+
+    def test_rolled_back_task_is_never_published(self, get_task_publisher):
+        with self.captureOnCommitCallbacks() as callbacks:
+            try:
+                with transaction.atomic():
+                    enqueue(send_welcome_email, 1)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(callbacks, [])
+        get_task_publisher.return_value.publish.assert_not_called()
+
+
+class FlakyEmailBackend(LocmemEmailBackend):
+    """Locmem backend that fails on ``fail_for`` recipients and counts connections."""
+
+    def __init__(self, *args, fail_for=(), fail_times=1, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.failures = {address: fail_times for address in fail_for}
+        self.opened = 0
+
+    def open(self):
+        self.opened += 1
+
+    def send_messages(self, messages):
+        count = 0
+        for message in messages:
+            address = message.to[0]
+            if self.failures.get(address):
+                self.failures[address] -= 1
+                raise ConnectionError(f'lost connection sending to {address}')
+            mail.outbox.append(message)
+            count += 1
+        return count
+
+
+class SendBatchedTests(TestCase):
+    """Bulk email over one connection with reconnects and per-message results."""
+
+    def messages(self, count):
+        return [EmailMessage('Hi', 'Body', 'from@example.com', [f'user{i}@example.com']) for i in range(count)]
+
+    def test_one_connection_for_all_batches(self):
+        backend = FlakyEmailBackend()
+        delivery = send_batched(self.messages(25), batch_size=10, connection=backend)
+        self.assertEqual(backend.opened, 1)
+        self.assertEqual(len(mail.outbox), 25)
+        self.assertEqual([batch['sent'] for batch in delivery['batches']], [10, 10, 5])
+
+    def test_reconnects_and_resends_only_unsent_messages(self):
+        backend = FlakyEmailBackend(fail_for=['user3@example.com'])
+        delivery = send_batched(self.messages(6), batch_size=10, connection=backend)
+        self.assertEqual(backend.opened, 2)
+        self.assertEqual(len(delivery['sent']), 6)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), sorted(f'user{i}@example.com' for i in range(6)))
+
+    def test_gives_up_on_message_failing_twice(self):
+        backend = FlakyEmailBackend(fail_for=['user1@example.com'], fail_times=2)
+        delivery = send_batched(self.messages(3), connection=backend)
+        self.assertEqual([m.to[0] for m in delivery['failed']], ['user1@example.com'])
+        self.assertEqual(len(delivery['sent']), 2)
+
+
+class FailingRecipientBackend(FlakyEmailBackend):
+    """FlakyEmailBackend that always fails for bob@example.com."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, fail_for=['bob@example.com'], fail_times=2, **kwargs)
+
+
+@override_settings(EMAIL_HOST_USER='noreply@example.com', EMAIL_BACKEND='api.tests.FailingRecipientBackend')
+class NotificationChunkTests(TestCase):
+    """Retries of a bulk notification chunk only cover failed recipients."""
+
+    def test_retry_only_failed_recipients(self):
+        users = [User.objects.create_user(name, f'{name}@example.com') for name in ('amy', 'bob', 'cid')]
+        with mock.patch.object(send_notification_chunk, 'retry', return_value=Retry()) as retry:
+            with self.assertRaises(Retry):
+                send_notification_chunk.run([user.id for user in users], 'Subject', 'Message')
+        self.assertEqual(retry.call_args.kwargs['args'][0], [users[1].id])
+        self.assertEqual(retry.call_args.kwargs['kwargs']['sent_before'], 2)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['amy@example.com', 'cid@example.com'])
+
+    def test_already_sent_recipients_counted_separately(self):
+        users = [User.objects.create_user(name, f'{name}@example.com') for name in ('amy', 'cid')]
+        send_notification_chunk.run([users[0].id], 'Subject', 'Message', idempotency_key='news')
+        result = send_notification_chunk.run([user.id for user in users], 'Subject', 'Message', idempotency_key='news')
+        self.assertEqual((result['sent_count'], result['skipped_count']), (1, 1))
+        self.assertEqual(summarize_bulk_notifications.run([result])['sent_count'], 1)
+
+
+@override_settings(EMAIL_HOST_USER='noreply@example.com', EMAIL_FANOUT_CHUNK_SIZE=2)
+class BulkNotificationTests(TestCase):
+    """send_bulk_notifications fans out into chunks and sums up their results."""
+
+    def setUp(self):
+        # Eager chords keep their results in the result backend; use memory, not the broker's Redis
+        backend = mock.patch.object(
+            type(celery_app), 'backend', new_callable=mock.PropertyMock,
+            return_value=CacheBackend(app=celery_app, backend='memory'),
+        )
+        backend.start()
+        self.addCleanup(backend.stop)
+
+    def test_chunks_and_summary(self):
+        users = [User.objects.create_user(f'user{i}', f'user{i}@example.com') for i in range(5)]
+        users.append(User.objects.create_user('noemail'))
+        with mock.patch.object(send_notification_chunk, 'retry', return_value=Retry()):
+            result = send_bulk_notifications.apply(args=[[user.id for user in users], 'Subject', 'Message']).get()
+        self.assertEqual(result, {
+            'chunks': 3,
+            'sent_count': 5,
+            'skipped_count': 0,
+            'failed_count': 1,
+            'failed_emails': [f'user_{users[-1].id}'],
+        })
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), [f'user{i}@example.com' for i in range(5)])
+        # Every chunk records its deliveries under the parent task's key
+        self.assertEqual(EmailDelivery.objects.values('message_key').distinct().count(), 1)
+
+    def test_no_recipients(self):
+        result = send_bulk_notifications.apply(args=[[], 'Subject', 'Message']).get()
+        self.assertEqual((result['chunks'], result['sent_count']), (0, 0))
+
+
+class DeliveryLedgerTests(TestCase):
+    """send_once skips recipients the ledger has as sent and counts attempts."""
+
+    def messages(self, *names):
+        return [EmailMessage('Hi', 'Body', 'from@example.com', [f'{name}@example.com']) for name in names]
+
+    def test_repeated_send_is_a_no_op_for_delivered_recipients(self):
+        send_once('greeting', self.messages('amy', 'bob'))
+        with self.assertNumQueries(1):
+            delivery = send_once('greeting', self.messages('amy', 'bob'))
+        self.assertEqual(len(delivery['skipped']), 2)
+        self.assertEqual(len(mail.outbox), 2)
+
+        send_once('greeting', self.messages('amy', 'bob', 'cid'))
+        self.assertEqual([m.to[0] for m in mail.outbox[2:]], ['cid@example.com'])
+
+    def test_failed_recipient_is_retried_and_attempts_counted(self):
+        backend = FlakyEmailBackend(fail_for=['bob@example.com'], fail_times=2)
+        with mock.patch('api.mail.get_connection', return_value=backend):
+            send_once('greeting', self.messages('amy', 'bob'))
+        send_once('greeting', self.messages('amy', 'bob'))
+        ledger = dict(EmailDelivery.objects.values_list('recipient', 'attempts'))
+        self.assertEqual(ledger, {'amy@example.com': 1, 'bob@example.com': 2})
+        self.assertEqual(set(EmailDelivery.objects.values_list('status', flat=True)), {EmailDelivery.SENT})
+
+
+@override_settings(EMAIL_HOST_USER='noreply@example.com')
+class EmailTaskIdempotencyTests(TestCase):
+    """Default idempotency keys cover one task invocation, not its content."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('amy', 'amy@example.com')
+
+    def test_same_text_sent_again_by_a_new_task(self):
+        send_notification_email.apply(args=[self.user.id, 'Subject', 'Message'])
+        send_notification_email.apply(args=[self.user.id, 'Subject', 'Message'])
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_explicit_content_key_sends_once(self):
+        key = derive_message_key('notification', 'Subject', 'Message')
+        for _ in range(2):
+            send_notification_email.apply(args=[self.user.id, 'Subject', 'Message'], kwargs={'idempotency_key': key})
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_welcome_emails_keyed_per_user(self):
+        twin = User.objects.create_user('amy2', 'amy@example.com')
+        send_welcome_email.run(self.user.id)
+        send_welcome_emails.run([self.user.id, twin.id])
+        send_welcome_emails.run([self.user.id, twin.id])
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(
+            set(EmailDelivery.objects.values_list('message_key', flat=True)),
+            {f'welcome:{self.user.id}', f'welcome:{twin.id}'},
+        )
+
+    def test_welcome_email_skips_blank_address(self):
+        user = User.objects.create_user('bob')
+        send_welcome_email.run(user.id)
+        self.assertEqual(mail.outbox, [])
+        self.assertFalse(EmailDelivery.objects.exists())
+
+
+@override_settings(API_LOG_DELETE_PAUSE=0)
+class CleanupOldLogsTests(TestCase):
+    """Batched deletion of expired API logs."""
+
+    def create_logs(self, count, age):
+        timestamp = timezone.now() - age
+        ApiLog.objects.bulk_create([
+            ApiLog(endpoint='/api/public/', method='GET', ip_address='127.0.0.1',
+                   timestamp=timestamp, response_status=200, response_time=0.01)
+            for _ in range(count)
+        ])
+
+    def test_deletes_only_expired_logs_in_batches(self):
+        self.create_logs(23, timedelta(days=40))
+        self.create_logs(5, timedelta(days=1))
+        with CaptureQueriesContext(connection) as queries:
+            result = cleanup_old_logs.run(retention_days=30, batch_size=5)
+        self.assertEqual(result, 'Cleaned up 23 old API logs')
+        self.assertEqual(ApiLog.objects.count(), 5)
+        # 23 consecutive ids in batches of 5
+        deletes = [q for q in queries if q['sql'].startswith('DELETE FROM "api_apilog"')]
+        self.assertEqual(len(deletes), 5)
+
+    def test_zero_retention_deletes_everything(self):
+        self.create_logs(4, timedelta(minutes=5))
+        self.assertEqual(cleanup_old_logs.run(retention_days=0), 'Cleaned up 4 old API logs')
+        self.assertFalse(ApiLog.objects.exists())
+
+
+@override_settings(API_LOG_SINK='api.log_writer.DirectApiLogSink', CACHES=LOCMEM_CACHES)
+class CachedTokenAuthenticationTests(TestCase):
+    """Cached token lookups hold no secrets and are dropped on changes."""
+
+    def setUp(self):
+        django_cache.clear()
+        self.user = User.objects.create_user('hank', 'hank@example.com', 'password123')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_cache_holds_no_password(self):
+        self.assertEqual(self.client.get('/api/protected/').status_code, 200)
+        user_id, created, fields = cache_utils.get(TOKEN_CACHE_NAMESPACE, token_cache_key(self.token.key))
+        self.assertEqual((user_id, created), (self.user.pk, self.token.created))
+        self.assertEqual(set(fields), set(CACHED_USER_FIELDS))
+        self.assertNotIn('password', fields)
+
+        with self.assertNumQueries(0):
+            user, token = CachedTokenAuthentication().authenticate_credentials(self.token.key)
+            self.assertEqual((user.pk, user.username, user.is_staff), (self.user.pk, 'hank', False))
+        self.assertEqual(token.user_id, self.user.pk)
+        # Anything else loads the user
+        with self.assertNumQueries(1):
+            self.assertEqual(user.date_joined, self.user.date_joined)
+
+    def test_warm_protected_endpoint_runs_no_queries(self):
+        self.assertEqual(self.client.get('/api/protected/').status_code, 200)
+        # The log write is the sink's business, not the request's
+        with mock.patch('api.middleware.get_log_sink'), self.assertNumQueries(0):
+            response = self.client.get('/api/protected/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            (response.data['username'], response.data['email'], response.data['is_superuser']),
+            ('hank', 'hank@example.com', False),
+        )
+
+    def test_email_change_refreshes_cached_fields(self):
+        self.assertEqual(self.client.get('/api/protected/').status_code, 200)
+        self.user.email = 'henry@example.com'
+        self.user.save()
+        self.assertEqual(self.client.get('/api/protected/').data['email'], 'henry@example.com')
+
+    def test_deleted_token_is_rejected(self):
+        self.assertEqual(self.client.get('/api/protected/').status_code, 200)
+        self.token.delete()
+        self.assertEqual(self.client.get('/api/protected/').status_code, 401)
+
+    def test_deactivated_user_is_rejected(self):
+        self.assertEqual(self.client.get('/api/protected/').status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/protected/').status_code, 401)
+
+
+@override_settings(API_LOG_SINK='api.log_writer.DirectApiLogSink', CACHES=LOCMEM_CACHES)
+class TokenLifecycleTests(TestCase):
+    """Token reuse, rotation and expiry."""
+
+    def setUp(self):
+        django_cache.clear()
+        self.user = User.objects.create_user('jack', 'jack@example.com', 'password123')
+        self.client = APIClient()
+
+    def get_protected(self, key):
+        return self.client.get('/api/protected/', HTTP_AUTHORIZATION=f'Token {key}')
+
+    def test_get_token_is_idempotent(self):
+        token = get_token(self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_token(self.user).key, token.key)
+        django_cache.clear()
+        self.assertEqual(get_token(self.user).key, token.key)
+        self.assertEqual(Token.objects.filter(user=self.user).count(), 1)
+
+    def test_old_key_rejected_after_rotation(self):
+        old_key = get_token(self.user).key
+        self.assertEqual(self.get_protected(old_key).status_code, 200)
+        response = self.client.post('/api/token/rotate/', HTTP_AUTHORIZATION=f'Token {old_key}')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.data['token'], old_key)
+        self.assertEqual(self.get_protected(old_key).status_code, 401)
+        self.assertEqual(self.get_protected(response.data['token']).status_code, 200)
+
+    @override_settings(API_TOKEN_TTL=60)
+    def test_expired_token_rejected_and_replaced_on_login(self):
+        token = get_token(self.user)
+        self.assertEqual(self.get_protected(token.key).status_code, 200)
+        Token.objects.filter(pk=token.pk).update(created=timezone.now() - timedelta(seconds=61))
+        django_cache.clear()
+        self.assertEqual(self.get_protected(token.key).status_code, 401)
+
+        response = self.client.post('/api/login/', {'username': 'jack', 'password': 'password123'}, format='json')
+        self.assertNotEqual(response.data['token'], token.key)
+        self.assertEqual(self.get_protected(response.data['token']).status_code, 200)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PermissionCacheTests(TestCase):
+    """Cached permission sets follow changes to the user, groups and permissions."""
+
+    def setUp(self):
+        django_cache.clear()
+        self.user = User.objects.create_user('ivy')
+        self.group = Group.objects.create(name='editors')
+        self.perm = Permission.objects.get(codename='change_userprofile')
+        self.perm_name = 'api.change_userprofile'
+
+    def permissions(self):
+        # A fresh instance each time: Django memoizes permissions per instance
+        return get_all_permissions(User.objects.get(pk=self.user.pk))
+
+    def test_user_permission_changes(self):
+        self.assertEqual(self.permissions(), set())
+        self.user.user_permissions.add(self.perm)
+        self.assertEqual(self.permissions(), {self.perm_name})
+        self.perm.user_set.remove(self.user)
+        self.assertEqual(self.permissions(), set())
+
+    def test_group_membership_and_group_permission_changes(self):
+        self.group.permissions.add(self.perm)
+        self.assertEqual(self.permissions(), set())
+        self.user.groups.add(self.group)
+        self.assertEqual(self.permissions(), {self.perm_name})
+        self.group.permissions.clear()
+        self.assertEqual(self.permissions(), set())
+        self.group.permissions.add(self.perm)
+        self.assertEqual(self.permissions(), {self.perm_name})
+        self.group.user_set.clear()
+        self.assertEqual(self.permissions(), set())
+
+    def test_user_save_refreshes_permissions(self):
+        self.assertEqual(self.permissions(), set())
+        self.user.is_superuser = True
+        self.user.save()
+        self.assertIn(self.perm_name, self.permissions())
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.permissions(), set())
+
+
+class PasswordUpgradeTests(TestCase):
+    """Hashes from Django's other default hashers verify and are upgraded."""
+
+    def assert_upgraded(self, algorithm):
+        user = User.objects.create_user('kim')
+        user.password = make_password('password123', hasher=algorithm)
+        user.save()
+        self.assertTrue(user.check_password('password123'))
+        user.refresh_from_db()
+        self.assertEqual(identify_hasher(user.password).algorithm, get_hasher().algorithm)
+
+    def test_existing_django_hashes_are_kept(self):
+        user = User.objects.create_user('lee', password='password123')
+        password = user.password
+        self.assertTrue(password.startswith('pbkdf2_sha256$'))
+        self.assertTrue(user.check_password('password123'))
+        user.refresh_from_db()
+        self.assertEqual(user.password, password)
+
+    def test_pbkdf2_sha1_hash_upgraded(self):
+        self.assert_upgraded('pbkdf2_sha1')
+
+    @override_settings(PASSWORD_HASHERS=['api.hashers.TunableArgon2PasswordHasher', 'api.hashers.TunablePBKDF2PasswordHasher'])
+    def test_pbkdf2_hash_upgraded_when_argon2_opted_in(self):
+        self.assert_upgraded('pbkdf2_sha256')
+
+    @skipUnless(find_spec('bcrypt'), 'bcrypt is not installed')
+    def test_bcrypt_hash_upgraded(self):
+        self.assert_upgraded('bcrypt_sha256')
+
+
+@override_settings(API_BULK_REGISTRATION_POOL_THRESHOLD=2, API_BULK_REGISTRATION_POOL_IDLE_TIMEOUT=0)
+class HashPasswordsPoolTests(SimpleTestCase):
+    """Large batches are hashed in a spawned process pool that shuts down when idle."""
+
+    def test_pool_hashes_in_order_and_shuts_down_when_idle(self):
+        passwords = [f'password{i}' for i in range(4)]
+        hashed = hashers.hash_passwords(passwords, workers=2)
+        self.assertEqual([check_password(password, value) for password, value in zip(passwords, hashed)], [True] * 4)
+        self.assertEqual(len(set(hashed)), 4)
+
+        deadline = time.monotonic() + 5
+        while hashers._pool is not None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertIsNone(hashers._pool)
+
+
+class RollupRefreshTests(TestCase):
+    """refresh_rollups folds each log exactly once, however it is batched."""
+
+    def setUp(self):
+        self.start = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=3)
+
+    def add_logs(self, first, count):
+        # Response times are multiples of 1/8 so sums are exact in any order
+        ApiLog.objects.bulk_create([
+            ApiLog(
+                endpoint=f'/api/endpoint{i % 2}/',
+                method='GET',
+                ip_address=f'10.0.0.{i % 3}',
+                timestamp=self.start + timedelta(seconds=97 * i),
+                response_status=500 if i % 5 == 0 else 200,
+                response_time=0.125 * (i % 7 + 1),
+            )
+            for i in range(first, first + count)
+        ])
+
+    def rollup_rows(self):
+        return list(ApiLogRollup.objects.order_by(
+            'granularity', 'bucket_start', 'endpoint', 'response_status'
+        ).values('granularity', 'bucket_start', 'endpoint', 'response_status', *ROLLUP_FIELDS)) + list(
+            ApiLogClientRollup.objects.order_by('granularity', 'bucket_start', 'ip_address')
+            .values_list('granularity', 'bucket_start', 'ip_address', 'request_count')
+        )
+
+    def test_second_refresh_changes_nothing(self):
+        self.add_logs(0, 30)
+        ApiLog.objects.create(endpoint='/api/new/', method='GET', ip_address='127.0.0.1', response_status=200, response_time=0.1)
+        self.assertEqual(refresh_rollups(), 30)
+        rows = self.rollup_rows()
+        self.assertEqual(refresh_rollups(), 0)
+        self.assertEqual(self.rollup_rows(), rows)
+
+    @override_settings(API_ROLLUP_BATCH_SIZE=4)
+    def test_incremental_batches_match_full_rebuild(self):
+        self.add_logs(0, 20)
+        self.assertEqual(refresh_rollups(), 20)
+        self.add_logs(20, 10)
+        self.assertEqual(refresh_rollups(), 10)
+        incremental = self.rollup_rows()
+
+        ApiLogRollup.objects.all().delete()
+        ApiLogClientRollup.objects.all().delete()
+        RollupWatermark.objects.all().delete()
+        with override_settings(API_ROLLUP_BATCH_SIZE=1000):
+            self.assertEqual(refresh_rollups(), 30)
+        self.assertEqual(incremental, self.rollup_rows())
+
+        end = self.start + timedelta(hours=2)
+        self.assertEqual(summarize_rollups(rollups_between(self.start, end)), {
+            'total_requests': 30,
+            'error_requests': 6,
+            'avg_response_time': sum(0.125 * (i % 7 + 1) for i in range(30)) / 30,
+        })
+
+
+@override_settings(API_ROLLUP_SETTLE_SECONDS=0)
+class RollupReportTests(TestCase):
+    """The report tasks give the same figures from rollups as from raw logs."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user('alice', 'alice@example.com', 'password123')
+        cls.bob = User.objects.create_user('bob', 'bob@example.com', 'password123')
+
+    def setUp(self):
+        now = timezone.now()
+        clients = [
+            (self.alice, '10.0.0.1'), (self.alice, '10.0.0.1'), (self.alice, '10.0.0.2'),
+            (self.bob, '10.0.0.3'), (None, '10.0.0.3'), (None, '10.0.0.4'),
+        ]
+        ApiLog.objects.bulk_create([
+            ApiLog(endpoint='/api/public/', method='GET', user=user, ip_address=ip,
+                   timestamp=now, response_status=200, response_time=0.125)
+            for user, ip in clients
+        ])
+
+    def run_task(self, task, source):
+        with override_settings(API_ANALYTICS_SOURCE=source):
+            return task.run()
+
+    def test_rollup_figures_match_raw_logs(self):
+        for task, fields in (
+            (generate_daily_report, ['total_requests', 'unique_users', 'unique_ips']),
+            (process_api_analytics, ['total_requests', 'unique_users', 'most_active_user']),
+        ):
+            with self.subTest(task=task.name):
+                rollup, raw = self.run_task(task, 'rollups'), self.run_task(task, 'raw')
+                self.assertEqual({field: rollup[field] for field in fields}, {field: raw[field] for field in fields})
+
+        report = self.run_task(generate_daily_report, 'rollups')
+        self.assertEqual((report['unique_users'], report['unique_ips']), (2, 4))
+        analytics = self.run_task(process_api_analytics, 'rollups')
+        self.assertEqual(analytics['most_active_user'], {'username': 'alice', 'request_count': 3})
+
+    def test_rollup_mode_reads_no_raw_logs_once_refreshed(self):
+        refresh_rollups()
+        for task in (generate_daily_report, process_api_analytics):
+            with self.subTest(task=task.name), mock.patch('api.tasks.refresh_rollups'), \
+                    CaptureQueriesContext(connection) as queries:
+                self.run_task(task, 'rollups')
+            self.assertFalse([q['sql'] for q in queries if '"api_apilog"' in q['sql']])
+
+    def test_client_rollups_hold_one_row_per_client(self):
+        refresh_rollups()
+        self.assertEqual(
+            ApiLogClientRollup.objects.filter(granularity=ApiLogClientRollup.HOUR).count(), 5
+        )
+        self.assertEqual(
+            ApiLogClientRollup.objects.get(
+                granularity=ApiLogClientRollup.HOUR, user=self.alice, ip_address='10.0.0.1'
+            ).request_count,
+            2,
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES, API_ROLLUP_SETTLE_SECONDS=0)
+class ApiLogAdminPerformanceTests(TestCase):
+    """The API log changelist in performance mode never scans the whole log table."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'admin12345')
+        cls.users = [User.objects.create_user(f'user{i}', f'user{i}@example.com', 'password123') for i in range(3)]
+        now = timezone.now()
+        # user1 is busiest, user2 was only seen before the 30-day choice window
+        rows = [(cls.users[0], now), (cls.users[1], now), (cls.users[1], now), (cls.users[2], now - timedelta(days=40))]
+        ApiLog.objects.bulk_create([
+            ApiLog(endpoint='/api/public/', method='GET', user=user, ip_address='127.0.0.1',
+                   timestamp=timestamp, response_status=200, response_time=0.1)
+            for user, timestamp in rows
+        ])
+        refresh_rollups()
+
+    def setUp(self):
+        django_cache.clear()
+        self.client.force_login(self.admin)
+
+    def changelist(self, **params):
+        response = self.client.get('/admin/api/apilog/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.context['cl']
+
+    def user_choices(self, changelist):
+        spec = next(spec for spec in changelist.filter_specs if spec.parameter_name == 'user')
+        return [username for _, username in spec.lookup_choices]
+
+    def test_default_window_and_estimated_paginator(self):
+        changelist = self.changelist()
+        self.assertIsInstance(changelist.paginator, EstimatedCountPaginator)
+        self.assertFalse(changelist.show_full_result_count)
+        # The 40-day-old row is outside the default 24h window
+        self.assertEqual(changelist.result_count, 3)
+        self.assertEqual(self.changelist(window='all').result_count, 4)
+
+    def test_filter_choices_are_cached(self):
+        self.changelist()
+        with CaptureQueriesContext(connection) as queries:
+            self.changelist()
+        self.assertFalse([q['sql'] for q in queries if 'DISTINCT' in q['sql'] or 'GROUP BY' in q['sql']])
+
+    def test_user_choices_come_from_client_rollups_busiest_first(self):
+        with CaptureQueriesContext(connection) as queries:
+            changelist = self.changelist()
+        self.assertEqual(self.user_choices(changelist), ['user1', 'user0'])
+        self.assertFalse([q['sql'] for q in queries if '"api_apilog"' in q['sql'] and 'GROUP BY' in q['sql']])
+
+    def test_user_outside_choices_can_still_be_selected(self):
+        django_cache.clear()
+        with mock.patch.object(ApiLogUserFilter, 'max_choices', 1):
+            changelist = self.changelist(user=self.users[2].pk, window='all')
+        self.assertEqual(self.user_choices(changelist), ['user2', 'user1'])
+        self.assertEqual(changelist.result_count, 1)
+
+
+class DDSketchTests(TestCase):
+    """Quantiles stay within the sketch's relative accuracy, built and merged any way."""
+
+    QUANTILES = (0, 0.01, 0.25, 0.5, 0.9, 0.95, 0.99, 1)
+
+    def setUp(self):
+        rng = random.Random(7)
+        # Long-tailed like real response times: 1ms to several seconds
+        self.values = [rng.lognormvariate(-3, 1.5) for _ in range(5000)]
+
+    def assert_within_accuracy(self, sketch, values):
+        ordered = sorted(values)
+        for q in self.QUANTILES:
+            exact = ordered[int(q * (len(ordered) - 1))]
+            with self.subTest(q=q):
+                self.assertLessEqual(abs(sketch.quantile(q) - exact), sketch.relative_accuracy * exact * (1 + 1e-9))
+
+    def sketch_of(self, values, accuracy=DEFAULT_RELATIVE_ACCURACY):
+        sketch = DDSketch(accuracy)
+        for value in values:
+            sketch.add(value)
+        return sketch
+
+    def test_quantiles_within_relative_accuracy(self):
+        for accuracy in (0.01, 0.05):
+            self.assert_within_accuracy(self.sketch_of(self.values, accuracy), self.values)
+
+    def test_merged_and_stored_sketches_keep_the_bound(self):
+        parts = [DDSketch() for _ in range(4)]
+        for i, value in enumerate(self.values):
+            parts[i % 4].add(value)
+        merged = DDSketch()
+        for part in parts:
+            merged.merge(DDSketch.from_dict(part.to_dict()))
+        self.assertEqual(merged.count, len(self.values))
+        self.assert_within_accuracy(merged, self.values)
+        with self.assertRaises(ValueError):
+            merged.merge(self.sketch_of([0.1], accuracy=0.05))
+
+    def test_zero_values_and_empty_sketch(self):
+        sketch = self.sketch_of([0, 0, 0, 0.5])
+        self.assertEqual(sketch.quantile(0.5), 0.0)
+        self.assertAlmostEqual(sketch.quantile(1), 0.5, delta=0.5 * sketch.relative_accuracy)
+        self.assertIsNone(DDSketch().quantile(0.5))
+
+    def test_sketch_built_in_sql_matches_python(self):
+        ApiLog.objects.bulk_create([
+            ApiLog(endpoint='/api/a/', method='GET', ip_address='127.0.0.1', response_status=200, response_time=value)
+            for value in self.values[:500]
+        ])
+        sketch = latency_sketches(ApiLog.objects.all())['/api/a/']
+        self.assertEqual(sketch.to_dict(), self.sketch_of(self.values[:500]).to_dict())
+
+
+class BackgroundBatcherTests(SimpleTestCase):
+    """Batching, background flushing and the bounded queue of BackgroundBatcher."""
+
+    def test_flushes_full_batch_in_background(self):
+        flushed = threading.Event()
+        batches = []
+        batcher = BackgroundBatcher(lambda batch: (batches.append(batch), flushed.set()), batch_size=3, flush_interval=60)
+        self.addCleanup(batcher.close)
+        for item in range(3):
+            batcher.put(item)
+        self.assertTrue(flushed.wait(5))
+        self.assertEqual(batches, [[0, 1, 2]])
+
+    def test_close_flushes_pending_items_in_order_and_batches(self):
+        batches = []
+        batcher = BackgroundBatcher(batches.append, batch_size=3, flush_interval=60)
+        for item in range(7):
+            batcher.put(item)
+        batcher.close()
+        self.assertEqual([item for batch in batches for item in batch], list(range(7)))
+        self.assertTrue(all(len(batch) <= 3 for batch in batches))
+        self.assertEqual(len(batcher), 0)
+
+    def test_full_queue_drops_oldest_items(self):
+        batches = []
+        batcher = BackgroundBatcher(batches.append, batch_size=100, flush_interval=60, max_queue_size=3)
+        for item in range(5):
+            batcher.put(item)
+        self.assertEqual(batcher.dropped, 2)
+        batcher.close()
+        self.assertEqual(batches, [[2, 3, 4]])
+
+    def test_failed_flush_does_not_stop_later_batches(self):
+        batches = []
+
+        def flush(batch):
+            if not batches:
+                batches.append(None)
+                raise RuntimeError('backend down')
+            batches.append(batch)
+
+        batcher = BackgroundBatcher(flush, batch_size=2, flush_interval=60)
+        for item in range(4):
+            batcher.put(item)
+        batcher.close()
+        self.assertEqual(batches[1:], [[2, 3]])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class NamespaceVersionTests(TestCase):
+    """Namespace versions are read once per request."""
+
+    def setUp(self):
+        django_cache.clear()
+        request_started.send(sender=self.__class__)
+        self.addCleanup(request_finished.send, sender=self.__class__)
+
+    def test_version_read_once_per_request(self):
+        with mock.patch('django_internship.cache._call', wraps=cache_utils._call) as call:
+            first = cache_utils.make_key('things', 'a')
+            second = cache_utils.make_key('things', 'b')
+        self.assertEqual((first, second), ('things:v1:a', 'things:v1:b'))
+        self.assertEqual(sum(1 for args in call.call_args_list if args[0][0] == 'get'), 2)
+
+        with mock.patch('django_internship.cache._call', wraps=cache_utils._call) as call:
+            cache_utils.make_key('things', 'c')
+        call.assert_not_called()
+
+    def test_invalidate_moves_to_new_version_within_request(self):
+        cache_utils.set('things', 'a', 1)
+        cache_utils.invalidate('things')
+        self.assertIsNone(cache_utils.get('things', 'a'))
+        self.assertEqual(cache_utils.make_key('things', 'a'), 'things:v2:a')
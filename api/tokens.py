@@ -0,0 +1,76 @@
+"""
+API token service: read-first lookup, race-safe creation, rotation and expiry.
+
+``Token.objects.get_or_create`` opens a transaction and may try an INSERT on
+every login. ``get_token`` instead reads the user's token from the cache,
+then the database, and only inserts when the user has none. A concurrent
+insert for the same user loses on the unique constraint and reads the
+winner's token.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from django_internship import cache
+
+NAMESPACE = 'user_token'
+
+
+def token_ttl():
+    """Token lifetime as a timedelta, or None when tokens never expire."""
+    seconds = getattr(settings, 'API_TOKEN_TTL', 0)
+    return timedelta(seconds=seconds) if seconds else None
+
+
+def token_expires_at(token):
+    ttl = token_ttl()
+    return token.created + ttl if ttl else None
+
+
+def is_expired(token):
+    expires_at = token_expires_at(token)
+    return expires_at is not None and expires_at <= timezone.now()
+
+
+def forget_user_token(user_id):
+    cache.delete(NAMESPACE, user_id)
+
+
+def _create_token(user):
+    try:
+        with transaction.atomic():
+            return Token.objects.create(user=user)
+    except IntegrityError:
+        # Another request created it first
+        return Token.objects.get(user=user)
+
+
+def get_token(user):
+    """
+    Return the user's token, creating one only when missing and rotating it
+    when expired. Repeated calls are a cache read.
+    """
+    cached = cache.get(NAMESPACE, user.pk)
+    if cached is not None:
+        key, created = cached
+        token = Token(key=key, user=user, created=created)
+    else:
+        token = Token.objects.filter(user=user).first() or _create_token(user)
+
+    if is_expired(token):
+        return rotate_token(user)
+    if cached is None:
+        cache.set(NAMESPACE, user.pk, (token.key, token.created))
+    return token
+
+
+def rotate_token(user):
+    """Replace the user's token with a new one; the old key stops working."""
+    with transaction.atomic():
+        Token.objects.filter(user=user).delete()
+        token = _create_token(user)
+    cache.set(NAMESPACE, user.pk, (token.key, token.created))
+    return token
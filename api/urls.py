@@ -10,11 +10,14 @@ urlpatterns = [
     
     # Authentication endpoints
     path('register/', views.register_user, name='register'),
+    path('register/bulk/', views.register_users_bulk, name='register-bulk'),
     path('login/', views.login_user, name='login'),
+    path('token/rotate/', views.rotate_token_view, name='token-rotate'),
     
     # User profile
     path('profile/', views.UserProfileView.as_view(), name='user-profile'),
     
     # API logs (admin only)
     path('logs/', views.ApiLogListView.as_view(), name='api-logs'),
+    path('logs/latency/', views.api_log_latency, name='api-log-latency'),
 ]
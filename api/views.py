@@ -1,28 +1,50 @@
 from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ValidationError
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
 from django.utils import timezone
-from datetime import datetime
+from django.utils.dateparse import parse_datetime
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_etags, quote_etag
+from datetime import datetime, timedelta
+import calendar
+import hashlib
 import time
 
+from django_internship import cache
+
 from .models import UserProfile, ApiLog
 from .serializers import (
     UserSerializer, 
     UserProfileSerializer, 
-    ApiLogSerializer, 
-    UserRegistrationSerializer
+    ApiLogValuesSerializer,
+    UserRegistrationSerializer,
+    BulkUserRegistrationSerializer
 )
+from .caching import cache_response
+from .pagination import ApiLogKeysetPagination
+from .outbox import enqueue
+from .permission_cache import get_all_permissions
+from .profile_cache import get_profile_data, set_profile_data
+from .registration import register_users
+from .tokens import get_token, rotate_token, token_expires_at
 from .tasks import send_welcome_email
+from .log_writer import build_log_record, get_client_ip, get_log_sink
+from .rollups import endpoint_rollups, rollup_latency_sketches, rollups_between
+
+# Longest window, in hours, api_log_latency reports on (90 days)
+LATENCY_MAX_HOURS = 2160
 
 
 class ApiLogMixin:
     """Mixin to log API requests."""
     
     def log_request(self, request, response):
-        """Log the API request."""
+        """Hand the API request to the configured log sink."""
         try:
             # Calculate response time (this is approximate)
             response_time = getattr(request, '_start_time', 0)
@@ -31,41 +53,34 @@ class ApiLogMixin:
             else:
                 response_time = 0
             
-            ApiLog.objects.create(
-                endpoint=request.path,
-                method=request.method,
-                user=request.user if request.user.is_authenticated else None,
-                ip_address=self.get_client_ip(request),
-                response_status=response.status_code,
-                response_time=response_time
-            )
+            get_log_sink().write(build_log_record(request, response, response_time))
         except Exception as e:
             # Don't let logging errors break the API
             print(f"Logging error: {e}")
     
     def get_client_ip(self, request):
         """Get client IP address."""
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
+        return get_client_ip(request)
     
     def dispatch(self, request, *args, **kwargs):
         """Override dispatch to add logging."""
+        if getattr(request, '_api_log_middleware', False):
+            # ApiLogMiddleware already logs this request with full timing.
+            return super().dispatch(request, *args, **kwargs)
         request._start_time = time.time()
         response = super().dispatch(request, *args, **kwargs)
         self.log_request(request, response)
         return response
 
 
+@cache_response('public_endpoint')
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
 def public_endpoint(request):
     """
     Public endpoint accessible to everyone.
     Returns current server time and basic API information.
+    Cached for API_RESPONSE_CACHE_TIMEOUT seconds, so server_time may lag by that much.
     """
     data = {
         'message': 'Welcome to Django Internship API!',
@@ -75,9 +90,12 @@ def public_endpoint(request):
             'public': '/api/public/',
             'protected': '/api/protected/',
             'register': '/api/register/',
+            'register_bulk': '/api/register/bulk/',
             'login': '/api/login/',
+            'token_rotate': '/api/token/rotate/',
             'profile': '/api/profile/',
-            'logs': '/api/logs/'
+            'logs': '/api/logs/',
+            'latency': '/api/logs/latency/'
         },
         'authentication': 'Token Authentication required for protected endpoints'
     }
@@ -97,7 +115,7 @@ def protected_endpoint(request):
         'username': request.user.username,
         'email': request.user.email,
         'access_time': timezone.now().isoformat(),
-        'user_permissions': list(request.user.get_all_permissions()),
+        'user_permissions': list(get_all_permissions(request.user)),
         'is_staff': request.user.is_staff,
         'is_superuser': request.user.is_superuser,
     }
@@ -112,11 +130,12 @@ def register_user(request):
     """
     serializer = UserRegistrationSerializer(data=request.data)
     if serializer.is_valid():
-        user = serializer.save()
-        token, created = Token.objects.get_or_create(user=user)
-        
-        # Send welcome email asynchronously
-        send_welcome_email.delay(user.id)
+        with transaction.atomic():
+            user = serializer.save()
+            token = get_token(user)
+            
+            # Send welcome email asynchronously once the user is committed
+            enqueue(send_welcome_email, user.id)
         
         return Response({
             'message': 'User registered successfully!',
@@ -129,6 +148,45 @@ def register_user(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAdminUser])
+def register_users_bulk(request):
+    """
+    Register a list of users in one transaction (admin only).
+    Body: {"users": [{"username", "email", "password", "password_confirm", ...}, ...]}
+    Nothing is created unless every entry is valid.
+    """
+    serializer = BulkUserRegistrationSerializer(data=request.data)
+    if serializer.is_valid():
+        entries = serializer.validated_data['users']
+        for entry in entries:
+            entry.pop('password_confirm')
+        try:
+            registered = register_users(entries)
+        except IntegrityError:
+            # Another request registered one of the usernames after validation
+            taken = sorted(User.objects.filter(
+                username__in=[entry['username'] for entry in entries]
+            ).values_list('username', flat=True))
+            if not taken:
+                raise
+            return Response(
+                {'users': [f"Usernames already taken: {', '.join(taken)}"]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        
+        return Response({
+            'message': f'{len(registered)} users registered successfully!',
+            'users': [
+                {'user_id': user.id, 'username': user.username, 'token': token.key}
+                for user, token in registered
+            ],
+            'email_sent': 'Welcome emails will be sent shortly'
+        }, status=status.HTTP_201_CREATED)
+    
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
 def login_user(request):
@@ -145,10 +203,11 @@ def login_user(request):
     
     user = authenticate(username=username, password=password)
     if user:
-        token, created = Token.objects.get_or_create(user=user)
+        token = get_token(user)
         return Response({
             'message': 'Login successful',
             'token': token.key,
+            'token_expires_at': token_expires_at(token),
             'user_id': user.id,
             'username': user.username
         }, status=status.HTTP_200_OK)
@@ -158,24 +217,200 @@ def login_user(request):
     }, status=status.HTTP_401_UNAUTHORIZED)
 
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def rotate_token_view(request):
+    """
+    Replace the caller's API token. The old token stops working immediately.
+    """
+    token = rotate_token(request.user)
+    return Response({
+        'message': 'Token rotated',
+        'token': token.key,
+        'token_expires_at': token_expires_at(token),
+    }, status=status.HTTP_200_OK)
+
+
 class UserProfileView(ApiLogMixin, generics.RetrieveUpdateAPIView):
     """
     Get or update user profile.
+    Profiles are created with their user (see api.signals), so a read is one
+    joined query, or none when API_PROFILE_CACHE_TIMEOUT enables the cache.
+
+    GET sends ETag/Last-Modified from ``updated_at`` and answers 304 to a
+    matching If-None-Match/If-Modified-Since; ``?fields=bio,user`` returns
+    only those fields. PUT/PATCH with If-Match (the ETag of a full GET) get
+    412 if the profile changed since.
     """
     serializer_class = UserProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     def get_object(self):
-        profile, created = UserProfile.objects.get_or_create(user=self.request.user)
-        return profile
+        queryset = UserProfile.objects.select_related('user')
+        if self.request.method in ('PUT', 'PATCH'):
+            # Held until update() commits, so the If-Match check and the save
+            # cannot interleave with another writer
+            queryset = queryset.select_for_update(of=('self',))
+        try:
+            return queryset.get(user_id=self.request.user.pk)
+        except UserProfile.DoesNotExist:
+            # Users saved without signals, e.g. loaded from raw fixtures
+            return UserProfile.objects.create(user=self.request.user)
+    
+    def retrieve(self, request, *args, **kwargs):
+        fields = self.get_requested_fields()
+        data = get_profile_data(request.user.pk)
+        if data is None:
+            data = self.get_serializer(self.get_object()).data
+            set_profile_data(request.user.pk, data)
+        
+        updated_at = parse_datetime(data['updated_at'])
+        if fields:
+            data = {name: data[name] for name in fields}
+        response = Response(data)
+        self.set_validators(response, updated_at, fields)
+        return get_conditional_response(
+            request, etag=response['ETag'], last_modified=int(updated_at.timestamp()), response=response
+        )
+    
+    def update(self, request, *args, **kwargs):
+        partial = kwargs.pop('partial', False)
+        with transaction.atomic():
+            profile = self.get_object()
+            if not self.if_match_passes(request, self.profile_etag(profile.updated_at)):
+                return Response({
+                    'error': 'Profile has changed since it was read; fetch it again and retry'
+                }, status=status.HTTP_412_PRECONDITION_FAILED)
+            serializer = self.get_serializer(profile, data=request.data, partial=partial)
+            serializer.is_valid(raise_exception=True)
+            self.perform_update(serializer)
+        
+        response = Response(serializer.data)
+        self.set_validators(response, profile.updated_at)
+        return response
+    
+    def get_requested_fields(self):
+        """Top-level fields named in ``?fields=``, or None for all of them."""
+        requested = [name.strip() for name in self.request.query_params.get('fields', '').split(',') if name.strip()]
+        unknown = sorted(set(requested) - set(self.serializer_class.Meta.fields))
+        if unknown:
+            raise ValidationError({'fields': f"Unknown fields: {', '.join(unknown)}"})
+        return requested or None
+    
+    def profile_etag(self, updated_at, fields=None):
+        """Strong ETag for this user's profile version (and field subset)."""
+        version = f"{self.request.user.pk}-{calendar.timegm(updated_at.utctimetuple())}{updated_at.microsecond:06d}"
+        if fields:
+            version += '-' + hashlib.md5(','.join(sorted(fields)).encode()).hexdigest()[:8]
+        return quote_etag(version)
+    
+    def set_validators(self, response, updated_at, fields=None):
+        response['ETag'] = self.profile_etag(updated_at, fields)
+        response['Last-Modified'] = http_date(updated_at.timestamp())
+        # Clients may store it but must revalidate before reuse
+        patch_cache_control(response, private=True, no_cache=True)
+    
+    def if_match_passes(self, request, etag):
+        header = request.META.get('HTTP_IF_MATCH')
+        if not header:
+            return True
+        etags = parse_etags(header)
+        return etags == ['*'] or etag in etags
 
 
 class ApiLogListView(ApiLogMixin, generics.ListAPIView):
     """
     List API logs (admin only).
+
+    Newest first, paged with an opaque ``cursor`` (see ApiLogKeysetPagination).
+    Optional filters: ``endpoint``, ``method``, ``status_min``/``status_max``,
+    ``user`` (id) and ``since``/``until`` (ISO 8601 datetimes).
+
+    Rows are read with values() and a join on the user, so a page is one
+    query whatever its size.
     """
-    serializer_class = ApiLogSerializer
+    serializer_class = ApiLogValuesSerializer
     permission_classes = [permissions.IsAuthenticated, permissions.IsAdminUser]
-    
+    pagination_class = ApiLogKeysetPagination
+
     def get_queryset(self):
-        return ApiLog.objects.all()[:100]  # Limit to last 100 logs
+        params = self.request.query_params
+        queryset = ApiLog.objects.all()
+
+        if params.get('endpoint'):
+            queryset = queryset.filter(endpoint=params['endpoint'])
+        if params.get('method'):
+            queryset = queryset.filter(method=params['method'].upper())
+        for param, lookup in (('status_min', 'response_status__gte'), ('status_max', 'response_status__lte')):
+            if params.get(param):
+                queryset = queryset.filter(**{lookup: self._int_param(param)})
+        if params.get('user'):
+            queryset = queryset.filter(user_id=self._int_param('user'))
+        for param, lookup in (('since', 'timestamp__gte'), ('until', 'timestamp__lt')):
+            if params.get(param):
+                queryset = queryset.filter(**{lookup: self._datetime_param(param)})
+        return ApiLogValuesSerializer.get_values(queryset)
+
+    def _int_param(self, name):
+        try:
+            return int(self.request.query_params[name])
+        except ValueError:
+            raise ValidationError({name: 'Must be an integer.'})
+
+    def _datetime_param(self, name):
+        try:
+            value = parse_datetime(self.request.query_params[name])
+        except ValueError:
+            value = None
+        if value is None:
+            raise ValidationError({name: 'Must be an ISO 8601 datetime.'})
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        return value
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated, permissions.IsAdminUser])
+def api_log_latency(request):
+    """
+    Per-endpoint latency percentiles (admin only).
+    Merged from the rollup sketches for the last ``hours`` hours (default 24)
+    and cached until the next rollup refresh.
+    """
+    try:
+        hours = int(request.query_params.get('hours', 24))
+    except ValueError:
+        hours = None
+    # Bounded so the window stays a valid datetime and the cache keys few
+    if hours is None or not 1 <= hours <= LATENCY_MAX_HOURS:
+        return Response(
+            {'error': f'hours must be an integer from 1 to {LATENCY_MAX_HOURS}'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    
+    def build():
+        now = timezone.now()
+        rollups = rollups_between(now - timedelta(hours=hours), now)
+        sketches = rollup_latency_sketches(rollups)
+        
+        endpoints = []
+        for row in endpoint_rollups(rollups):
+            sketch = sketches.get(row['endpoint'])
+            endpoints.append({
+                'endpoint': row['endpoint'],
+                'requests': row['requests'],
+                'avg_response_time': row['avg_time'],
+                **(sketch.percentiles() if sketch else {}),
+            })
+        
+        return {
+            'hours': hours,
+            'generated_at': now.isoformat(),
+            'endpoints': sorted(endpoints, key=lambda e: e.get('p99') or 0, reverse=True)
+        }
+    
+    # Invalidated by refresh_api_log_rollups whenever new logs are rolled up
+    data = cache.get_or_set(
+        'api_analytics', f'latency:{hours}', build, settings.API_ANALYTICS_CACHE_TIMEOUT
+    )
+    return Response(data, status=status.HTTP_200_OK)
@@ -0,0 +1,156 @@
+"""
+Project cache helpers shared by the api views, the Telegram bot and the
+Celery tasks.
+
+Keys are namespaced as ``<namespace>:v<version>:<key>``. Every namespace keeps
+its own version number in the cache, so ``invalidate(namespace)`` retires all
+of its keys at once without scanning the backend. Versions are read once per
+request and remembered until it finishes. ``get_or_set`` protects expensive
+values from cache stampedes. Backend errors are logged and treated as misses,
+and after one the backend is left alone for BACKEND_RETRY_INTERVAL seconds,
+so an unreachable cache slows requests down but never breaks them.
+"""
+import logging
+import threading
+import time
+
+from django.core.cache import cache
+from django.core.signals import request_finished, request_started
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+# How long a get_or_set refresh may run before another process takes over,
+# and how often waiting processes poll for its result.
+LOCK_TIMEOUT = 10
+LOCK_POLL_INTERVAL = 0.05
+# Seconds to skip the backend after it raised, instead of waiting for the
+# socket timeout on every call.
+BACKEND_RETRY_INTERVAL = 5
+
+_FAILED = object()
+_backend_down_until = 0
+_local = threading.local()
+
+
+def _call(method, *args, default=None):
+    global _backend_down_until
+    if time.monotonic() < _backend_down_until:
+        return default
+    try:
+        return getattr(cache, method)(*args)
+    except (ValueError, TypeError) as e:
+        # A missing key for incr or an unpicklable value, not an outage
+        logger.warning(f"Cache {method} failed: {e}")
+        return default
+    except Exception as e:
+        _backend_down_until = time.monotonic() + BACKEND_RETRY_INTERVAL
+        logger.warning(f"Cache {method} failed, skipping the cache for {BACKEND_RETRY_INTERVAL}s: {e}")
+        return default
+
+
+@receiver(request_started)
+@receiver(request_finished)
+def reset_namespace_versions(signal, **kwargs):
+    """Start each request with an empty version memo; none outside requests."""
+    _local.versions = {} if signal is request_started else None
+
+
+def namespace_version(namespace):
+    """Current version of ``namespace``, starting at 1, or None if unknown."""
+    versions = getattr(_local, 'versions', None)
+    if versions is not None and namespace in versions:
+        return versions[namespace]
+
+    key = f"{namespace}:version"
+    version = _call('get', key, default=_FAILED)
+    if version is None:
+        _call('add', key, 1, None)
+        version = _call('get', key, default=_FAILED)
+    if version is _FAILED or version is None:
+        # Guessing a version could serve values an invalidate() retired
+        return None
+    if versions is not None:
+        versions[namespace] = version
+    return version
+
+
+def make_key(namespace, key):
+    """Full cache key, or None when the namespace version cannot be read."""
+    version = namespace_version(namespace)
+    return None if version is None else f"{namespace}:v{version}:{key}"
+
+
+def get(namespace, key, default=None):
+    full_key = make_key(namespace, key)
+    value = None if full_key is None else _call('get', full_key)
+    return default if value is None else value
+
+
+def set(namespace, key, value, timeout=None):
+    """Store ``value``; ``timeout`` defaults to the backend's TIMEOUT."""
+    timeout = cache.default_timeout if timeout is None else timeout
+    full_key = make_key(namespace, key)
+    if full_key is not None:
+        _call('set', full_key, value, timeout)
+
+
+def delete(namespace, key):
+    full_key = make_key(namespace, key)
+    if full_key is not None:
+        _call('delete', full_key)
+
+
+def invalidate(namespace):
+    """Drop every key in ``namespace`` by moving it to a new version."""
+    versions = getattr(_local, 'versions', None)
+    if versions is not None:
+        versions.pop(namespace, None)
+    key = f"{namespace}:version"
+    if _call('incr', key) is None and not _call('add', key, 2, None):
+        # incr raises ValueError when the version key has been evicted
+        _call('set', key, int(time.time()), None)
+
+
+def get_or_set(namespace, key, func, timeout=None):
+    """
+    Return the cached value for ``key``, computing it with ``func()`` when
+    missing or stale.
+
+    Only one process recomputes a key at a time. Others serve the stale
+    value meanwhile, or wait up to LOCK_TIMEOUT seconds for the first fill.
+    Values are stored with their refresh time, so keys filled here should
+    only be read back through get_or_set.
+    """
+    timeout = cache.default_timeout if timeout is None else timeout
+    full_key = make_key(namespace, key)
+    if full_key is None:
+        return func()
+    lock_key = f"{full_key}:lock"
+
+    entry = _call('get', full_key)
+    if entry is not None:
+        value, refresh_at = entry
+        if time.time() < refresh_at or not _call('add', lock_key, 1, LOCK_TIMEOUT, default=True):
+            return value
+    elif not _call('add', lock_key, 1, LOCK_TIMEOUT, default=True):
+        deadline = time.time() + LOCK_TIMEOUT
+        while time.time() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            entry = _call('get', full_key)
+            if entry is not None:
+                return entry[0]
+        logger.warning(f"Timed out waiting for cache key {full_key}")
+        return func()
+
+    try:
+        value = func()
+        if timeout is None:
+            _call('set', full_key, (value, float('inf')), None)
+        else:
+            # Keep the stale value a little longer than its refresh time so
+            # other processes have something to serve during the refresh
+            _call('set', full_key, (value, time.time() + timeout), timeout + LOCK_TIMEOUT)
+        return value
+    finally:
+        _call('delete', lock_key)
@@ -6,6 +6,7 @@ Production-ready settings with environment variables.
 
 from pathlib import Path
 from decouple import config
+from django.core.exceptions import ImproperlyConfigured
 import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,6 +42,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so logged response times cover the whole middleware chain.
+    'api.middleware.ApiLogMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -103,6 +106,55 @@ if not config('DB_PASSWORD', default=''):
         }
     }
 
+# Cache
+# CACHE_BACKEND is 'locmem' (per process, the default), 'file' (CACHE_LOCATION
+# directory, shared by the processes on one host) or 'redis' (CACHE_REDIS_URL,
+# falling back to REDIS_URL, shared by all hosts). Bump CACHE_VERSION to
+# discard everything cached by a previous deploy.
+CACHE_BACKEND = config('CACHE_BACKEND', default='locmem')
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'django-internship',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': config('CACHE_LOCATION', default=str(BASE_DIR / 'cache')),
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('CACHE_REDIS_URL', default=config('REDIS_URL', default='redis://localhost:6379/0')),
+        # Fail fast so an unreachable Redis degrades to "no cache"
+        'OPTIONS': {'socket_connect_timeout': 1, 'socket_timeout': 1},
+    },
+}
+if CACHE_BACKEND not in CACHE_BACKENDS:
+    raise ImproperlyConfigured(f"CACHE_BACKEND must be one of {', '.join(CACHE_BACKENDS)}")
+CACHES = {
+    'default': {
+        **CACHE_BACKENDS[CACHE_BACKEND],
+        'KEY_PREFIX': 'django_internship',
+        'TIMEOUT': config('CACHE_TIMEOUT', default=300, cast=int),
+        'VERSION': config('CACHE_VERSION', default=1, cast=int),
+    }
+}
+
+# API token lifetime in seconds (0 = never expires). Expired tokens are
+# rejected and replaced on the next login; POST /api/token/rotate/ replaces one
+# on demand.
+API_TOKEN_TTL = config('API_TOKEN_TTL', default=0, cast=int)
+# Seconds a token -> user lookup is cached by CachedTokenAuthentication.
+API_TOKEN_CACHE_TIMEOUT = config('API_TOKEN_CACHE_TIMEOUT', default=60, cast=int)
+# Seconds a user's get_all_permissions() result is cached across requests.
+API_PERMISSION_CACHE_TIMEOUT = config('API_PERMISSION_CACHE_TIMEOUT', default=300, cast=int)
+
+# Seconds /api/profile/ responses are cached per user (0 disables the cache).
+API_PROFILE_CACHE_TIMEOUT = config('API_PROFILE_CACHE_TIMEOUT', default=0, cast=int)
+
+# Seconds that public_endpoint and root_view responses are served from cache.
+# Kept short because both report the current server time.
+API_RESPONSE_CACHE_TIMEOUT = config('API_RESPONSE_CACHE_TIMEOUT', default=5, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -123,6 +175,44 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# New and upgraded hashes use PASSWORD_HASHER: 'pbkdf2' (default, Django's
+# own hasher and cost) or 'argon2' (opt-in). Hashes made by the other one,
+# with other cost settings, or by Django's other default hashers (bcrypt
+# hashes need the bcrypt package) still verify and are rehashed on the user's
+# next successful login, so switching rewrites every active user's hash.
+# The Argon2 defaults are the OWASP minimum (19 MiB, 2 passes, 1 lane), which
+# verifies far faster than 600k rounds of PBKDF2 but uses 19 MiB per verify;
+# size login capacity with `manage.py benchmark_login` before switching.
+PASSWORD_HASHER = config('PASSWORD_HASHER', default='pbkdf2')
+ARGON2_TIME_COST = config('ARGON2_TIME_COST', default=2, cast=int)
+ARGON2_MEMORY_COST = config('ARGON2_MEMORY_COST', default=19456, cast=int)
+ARGON2_PARALLELISM = config('ARGON2_PARALLELISM', default=1, cast=int)
+PBKDF2_ITERATIONS = config('PBKDF2_ITERATIONS', default=600000, cast=int)
+PASSWORD_HASHER_CLASSES = {
+    'argon2': 'api.hashers.TunableArgon2PasswordHasher',
+    'pbkdf2': 'api.hashers.TunablePBKDF2PasswordHasher',
+}
+if PASSWORD_HASHER not in PASSWORD_HASHER_CLASSES:
+    raise ImproperlyConfigured(f"PASSWORD_HASHER must be one of {', '.join(PASSWORD_HASHER_CLASSES)}")
+PASSWORD_HASHERS = [PASSWORD_HASHER_CLASSES[PASSWORD_HASHER]] + [
+    path for name, path in PASSWORD_HASHER_CLASSES.items() if name != PASSWORD_HASHER
+] + [
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+# POST /api/register/bulk/ accepts up to API_BULK_REGISTRATION_MAX_USERS users
+# and hashes their passwords in a pool of API_BULK_REGISTRATION_HASH_WORKERS
+# processes (0 = one per core, at most 4) once a batch has at least
+# API_BULK_REGISTRATION_POOL_THRESHOLD users; smaller batches hash inline.
+# The pool is shut down after API_BULK_REGISTRATION_POOL_IDLE_TIMEOUT idle
+# seconds.
+API_BULK_REGISTRATION_MAX_USERS = config('API_BULK_REGISTRATION_MAX_USERS', default=1000, cast=int)
+API_BULK_REGISTRATION_HASH_WORKERS = config('API_BULK_REGISTRATION_HASH_WORKERS', default=0, cast=int)
+API_BULK_REGISTRATION_POOL_THRESHOLD = config('API_BULK_REGISTRATION_POOL_THRESHOLD', default=16, cast=int)
+API_BULK_REGISTRATION_POOL_IDLE_TIMEOUT = config('API_BULK_REGISTRATION_POOL_IDLE_TIMEOUT', default=60, cast=int)
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
 
@@ -149,7 +239,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Django REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -163,6 +253,44 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20
 }
 
+# API request logging
+# Records are queued in-process and written with bulk_create by a background
+# thread; use 'api.log_writer.DirectApiLogSink' to write one row per request.
+API_LOG_SINK = config('API_LOG_SINK', default='api.log_writer.BufferedApiLogSink')
+API_LOG_BATCH_SIZE = config('API_LOG_BATCH_SIZE', default=100, cast=int)
+API_LOG_FLUSH_INTERVAL = config('API_LOG_FLUSH_INTERVAL', default=2.0, cast=float)
+API_LOG_MAX_QUEUE_SIZE = config('API_LOG_MAX_QUEUE_SIZE', default=10000, cast=int)
+# Requests whose path starts with one of these are logged by ApiLogMiddleware.
+API_LOG_PATH_PREFIXES = ['/api/']
+# Retention used by cleanup_old_logs, which deletes in batches of
+# API_LOG_DELETE_BATCH_SIZE ids with API_LOG_DELETE_PAUSE seconds in between.
+API_LOG_RETENTION_DAYS = config('API_LOG_RETENTION_DAYS', default=30, cast=int)
+API_LOG_DELETE_BATCH_SIZE = config('API_LOG_DELETE_BATCH_SIZE', default=5000, cast=int)
+API_LOG_DELETE_PAUSE = config('API_LOG_DELETE_PAUSE', default=0.5, cast=float)
+# PostgreSQL only: partition size ('day' or 'month') and how many future
+# partitions to keep created (see `manage.py api_log_partitions`)
+API_LOG_PARTITION_PERIOD = config('API_LOG_PARTITION_PERIOD', default='month')
+API_LOG_PARTITIONS_AHEAD = config('API_LOG_PARTITIONS_AHEAD', default=3, cast=int)
+# Admin changelist for API logs: planner-estimated counts, cached filter
+# choices and a default time window ('1h', '24h', '7d', '30d' or 'all')
+# instead of COUNT(*)/DISTINCT over the whole table.
+API_LOG_ADMIN_PERFORMANCE_MODE = config('API_LOG_ADMIN_PERFORMANCE_MODE', default=True, cast=bool)
+API_LOG_ADMIN_DEFAULT_WINDOW = config('API_LOG_ADMIN_DEFAULT_WINDOW', default='24h')
+API_LOG_ADMIN_FILTER_CACHE_TIMEOUT = config('API_LOG_ADMIN_FILTER_CACHE_TIMEOUT', default=300, cast=int)
+
+# API analytics
+# 'rollups' makes the report tasks read pre-aggregated ApiLogRollup and
+# ApiLogClientRollup rows; 'raw' aggregates ApiLog directly.
+API_ANALYTICS_SOURCE = config('API_ANALYTICS_SOURCE', default='rollups')
+API_ROLLUP_BATCH_SIZE = config('API_ROLLUP_BATCH_SIZE', default=50000, cast=int)
+API_ROLLUP_SETTLE_SECONDS = config('API_ROLLUP_SETTLE_SECONDS', default=30, cast=int)
+API_ROLLUP_MINUTE_RETENTION_DAYS = config('API_ROLLUP_MINUTE_RETENTION_DAYS', default=8, cast=int)
+# Relative error of the latency percentiles kept on each rollup
+API_LATENCY_SKETCH_ACCURACY = config('API_LATENCY_SKETCH_ACCURACY', default=0.01, cast=float)
+# Upper bound on how long /api/logs/latency/ results are cached; they are
+# also dropped whenever refresh_api_log_rollups folds in new logs.
+API_ANALYTICS_CACHE_TIMEOUT = config('API_ANALYTICS_CACHE_TIMEOUT', default=300, cast=int)
+
 # Celery Configuration
 CELERY_BROKER_URL = config('REDIS_URL', default='redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = config('REDIS_URL', default='redis://localhost:6379/0')
@@ -170,6 +298,23 @@ CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+# Tasks queued with api.outbox.enqueue() are published after their transaction
+# commits, in batches by a background thread; use
+# 'api.outbox.DirectTaskPublisher' to publish each one as it commits.
+API_TASK_PUBLISHER = config('API_TASK_PUBLISHER', default='api.outbox.BufferedTaskPublisher')
+API_TASK_BATCH_SIZE = config('API_TASK_BATCH_SIZE', default=100, cast=int)
+API_TASK_FLUSH_INTERVAL = config('API_TASK_FLUSH_INTERVAL', default=0.5, cast=float)
+API_TASK_MAX_QUEUE_SIZE = config('API_TASK_MAX_QUEUE_SIZE', default=10000, cast=int)
+CELERY_BEAT_SCHEDULE = {
+    'refresh-api-log-rollups': {
+        'task': 'api.tasks.refresh_api_log_rollups',
+        'schedule': 60.0,
+    },
+    'maintain-api-log-partitions': {
+        'task': 'api.tasks.maintain_api_log_partitions',
+        'schedule': 6 * 60 * 60.0,
+    },
+}
 
 # Email Configuration for Celery tasks
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -178,6 +323,11 @@ EMAIL_PORT = config('EMAIL_PORT', default=587, cast=int)
 EMAIL_USE_TLS = True
 EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
+# Bulk email tasks send over one connection, EMAIL_BATCH_SIZE messages per
+# send_messages() call, and log throughput per batch. send_bulk_notifications
+# fans out to parallel tasks of EMAIL_FANOUT_CHUNK_SIZE recipients each.
+EMAIL_BATCH_SIZE = config('EMAIL_BATCH_SIZE', default=100, cast=int)
+EMAIL_FANOUT_CHUNK_SIZE = config('EMAIL_FANOUT_CHUNK_SIZE', default=500, cast=int)
 
 # Telegram Bot Configuration
 TELEGRAM_BOT_TOKEN = config('TELEGRAM_BOT_TOKEN', default='')
@@ -7,7 +7,10 @@ from django.http import JsonResponse
 from django.conf import settings
 from django.conf.urls.static import static
 
+from api.caching import cache_response
 
+
+@cache_response('root_view')
 def root_view(request):
     """Root endpoint with project information."""
     return JsonResponse({
@@ -10,6 +10,7 @@ from django.conf import settings
 from django.contrib.auth.models import User
 from asgiref.sync import sync_to_async
 from .models import TelegramUser, BotMessage
+from . import user_cache
 
 # Configure logging
 logging.basicConfig(
@@ -267,11 +268,8 @@ Hello! Please use /start first to register with the bot.
     
     @sync_to_async
     def get_telegram_user(self, telegram_id) -> Optional[TelegramUser]:
-        """Get telegram user from database."""
-        try:
-            return TelegramUser.objects.get(telegram_id=telegram_id)
-        except TelegramUser.DoesNotExist:
-            return None
+        """Get telegram user, from the cache when it was looked up recently."""
+        return user_cache.get_telegram_user(telegram_id)
     
     @sync_to_async
     def log_message(self, telegram_user: TelegramUser, message_type: str, content: str):
@@ -0,0 +1,14 @@
+"""
+Signal receivers that keep the telegram_bot app's caches consistent.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import TelegramUser
+from .user_cache import forget_telegram_user
+
+
+@receiver(post_save, sender=TelegramUser)
+@receiver(post_delete, sender=TelegramUser)
+def forget_changed_telegram_user(sender, instance, **kwargs):
+    forget_telegram_user(instance.telegram_id)
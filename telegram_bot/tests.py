@@ -1,3 +1,53 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache as django_cache
+from django.test import TestCase, override_settings
 
-# Create your tests here.
+from django_internship import cache as cache_utils
+
+from . import user_cache
+from .models import TelegramUser
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TelegramUserCacheTests(TestCase):
+    """Cached sender lookups hold only the handlers' fields and follow edits."""
+
+    def setUp(self):
+        django_cache.clear()
+        self.user = User.objects.create_user('lena', 'lena@example.com', 'password123')
+        self.telegram_user = TelegramUser.objects.create(
+            telegram_id=42, chat_id=42, first_name='Lena', django_user=self.user,
+        )
+
+    def test_cached_lookup_skips_database_and_password(self):
+        user_cache.get_telegram_user(42)
+        entry = cache_utils.get(user_cache.NAMESPACE, 42)
+        self.assertEqual(set(entry), set(user_cache.FIELDS))
+        self.assertNotIn(self.user.password, entry.values())
+
+        with self.assertNumQueries(0):
+            telegram_user = user_cache.get_telegram_user(42)
+            self.assertEqual(telegram_user.pk, self.telegram_user.pk)
+            self.assertEqual(telegram_user.full_name, 'Lena')
+            self.assertEqual(telegram_user.django_user.username, 'lena')
+
+    def test_unknown_user_is_none(self):
+        self.assertIsNone(user_cache.get_telegram_user(7))
+
+    def test_unlinked_user_has_no_django_user(self):
+        self.telegram_user.django_user = None
+        self.telegram_user.save()
+        with self.assertNumQueries(1):
+            self.assertIsNone(user_cache.get_telegram_user(42).django_user)
+
+    def test_edits_outside_the_bot_are_picked_up(self):
+        user_cache.get_telegram_user(42)
+        # e.g. deactivated in the admin
+        self.telegram_user.is_active = False
+        self.telegram_user.save()
+        self.assertFalse(user_cache.get_telegram_user(42).is_active)
+
+        self.telegram_user.delete()
+        self.assertIsNone(user_cache.get_telegram_user(42))
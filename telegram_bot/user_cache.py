@@ -0,0 +1,44 @@
+"""
+Cache of the TelegramUser fields the bot's handlers read.
+
+Every update looks up its sender, so recent lookups are kept in the shared
+cache. Only the listed fields are stored, never the linked user's password.
+The receivers in telegram_bot.signals drop an entry whenever its
+TelegramUser is saved or deleted, including edits made in the admin.
+"""
+from django.contrib.auth.models import User
+
+from django_internship import cache
+
+from .models import TelegramUser
+
+NAMESPACE = 'telegram_user'
+TIMEOUT = 60
+FIELDS = (
+    'id', 'telegram_id', 'username', 'first_name', 'last_name',
+    'created_at', 'is_active', 'django_user_id', 'django_user__username',
+)
+
+
+def get_telegram_user(telegram_id):
+    """
+    Return a TelegramUser built from the cached fields, or None if there is
+    no such user. Its ``django_user`` carries only the id and username.
+    """
+    fields = cache.get(NAMESPACE, telegram_id)
+    if fields is None:
+        fields = TelegramUser.objects.filter(telegram_id=telegram_id).values(*FIELDS).first()
+        if fields is None:
+            return None
+        cache.set(NAMESPACE, telegram_id, fields, TIMEOUT)
+
+    fields = dict(fields)
+    django_username = fields.pop('django_user__username')
+    telegram_user = TelegramUser(**fields)
+    if telegram_user.django_user_id is not None:
+        telegram_user.django_user = User(pk=telegram_user.django_user_id, username=django_username)
+    return telegram_user
+
+
+def forget_telegram_user(telegram_id):
+    cache.delete(NAMESPACE, telegram_id)